@@ -0,0 +1,6 @@
+""" Performance benchmarks for strategies
+
+Each module can be run as a script, e.g.
+
+    python -m benchmarks.bench_traverse
+"""
@@ -0,0 +1,134 @@
+""" Run the benchmark suite or compare two runs
+
+    python -m benchmarks run [-k PATTERN] [-o results.json]
+    python -m benchmarks compare old.json new.json
+
+Each case is timed with ``timeit`` (best of several repeats) and its peak
+memory is measured with ``tracemalloc`` over a single run.  Results are
+written as JSON together with the current git commit so runs made on
+different commits can be compared.
+"""
+from __future__ import print_function
+
+import argparse
+import gc
+import json
+import subprocess
+import sys
+import timeit
+import tracemalloc
+
+from .suite import CASES
+
+
+def commit():
+    try:
+        out = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                      stderr=subprocess.STDOUT)
+        return out.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(fn, repeat=5, min_time=0.2):
+    """ Best time per call in seconds and peak memory in bytes """
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def run(pattern=None, repeat=5, out=sys.stdout):
+    results = dict()
+    for name, setup in CASES:
+        if pattern and pattern not in name:
+            continue
+        try:
+            seconds, peak = measure(setup(), repeat=repeat)
+        except Exception as e:
+            results[name] = dict(error='%s: %s' % (type(e).__name__, e))
+            print('%-50s %s' % (name, results[name]['error'][:60]), file=out)
+            continue
+        results[name] = dict(seconds=seconds, peak_bytes=peak)
+        print('%-50s %12s %10s' % (name, _time(seconds), _bytes(peak)),
+              file=out)
+    return dict(commit=commit(), python=sys.version.split()[0],
+                results=results)
+
+
+def compare(old, new, out=sys.stdout):
+    print('%-50s %12s %12s %8s %8s' % ('case', old['commit'], new['commit'],
+                                       'time', 'memory'), file=out)
+    for name in sorted(set(old['results']) | set(new['results'])):
+        a = old['results'].get(name, {})
+        b = new['results'].get(name, {})
+        if 'seconds' not in a or 'seconds' not in b:
+            print('%-50s %12s %12s' % (name, _status(a), _status(b)),
+                  file=out)
+            continue
+        print('%-50s %12s %12s %7.2fx %7.2fx' % (
+              name, _time(a['seconds']), _time(b['seconds']),
+              b['seconds'] / a['seconds'],
+              b['peak_bytes'] / float(max(a['peak_bytes'], 1))), file=out)
+
+
+def _status(result):
+    if not result:
+        return 'missing'
+    if 'error' in result:
+        return 'error'
+    return _time(result['seconds'])
+
+
+def _time(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return '%.3g%s' % (seconds / scale, unit)
+    return '%.3gns' % (seconds / 1e-9)
+
+
+def _bytes(n):
+    for unit, scale in (('MB', 2 ** 20), ('kB', 2 ** 10)):
+        if n >= scale:
+            return '%.3g%s' % (n / float(scale), unit)
+    return '%dB' % n
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    sub = parser.add_subparsers(dest='command')
+    p = sub.add_parser('run', help='run the benchmark suite')
+    p.add_argument('-k', dest='pattern', help='only cases containing PATTERN')
+    p.add_argument('-o', dest='output', help='write results to a JSON file')
+    p.add_argument('-r', dest='repeat', type=int, default=5)
+    p = sub.add_parser('compare', help='compare two JSON result files')
+    p.add_argument('old')
+    p.add_argument('new')
+    args = parser.parse_args(argv)
+
+    if args.command == 'compare':
+        with open(args.old) as f:
+            old = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        compare(old, new)
+    elif args.command == 'run':
+        results = run(args.pattern, args.repeat)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=1, sort_keys=True)
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
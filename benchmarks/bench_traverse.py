@@ -0,0 +1,72 @@
+""" Iterative traversals against the original recursive implementation """
+from __future__ import print_function
+from timeit import repeat
+
+from toolz import curry
+from strategies.core import chain
+from strategies.term import operator, arguments, term
+from strategies.traverse import top_down, bottom_up
+from .trees import wide, balanced, deep
+
+
+@curry
+def rec_top_down(rule, x):
+    return chain([rule, lambda expr: rec_sall(rec_top_down(rule))(expr)], x)
+
+@curry
+def rec_bottom_up(rule, x):
+    return chain([lambda expr: rec_sall(rec_bottom_up(rule))(expr), rule], x)
+
+@curry
+def rec_sall(rule, expr):
+    try:
+        op = operator(expr)
+        children = arguments(expr)
+        if children:
+            children = list(map(rule, children))
+        return term(op, children)
+    except NotImplementedError:
+        return expr
+
+
+identity = lambda x: x
+zero = lambda x: 0 if x == 'x' else x
+
+TREES = [('wide(1000)', wide(1000)),
+         ('balanced(12)', balanced(12, leaf='x')),
+         ('deep(60)', deep(60))]
+
+CASES = [('top_down', top_down, rec_top_down),
+         ('bottom_up', bottom_up, rec_bottom_up)]
+
+
+def main(number=5):
+    print("%-12s %-14s %-10s %12s %12s %8s" % (
+          'strategy', 'tree', 'rule', 'recursive', 'iterative', 'speedup'))
+    for name, new, old in CASES:
+        for tname, tree in TREES:
+            for rname, rule in [('identity', identity), ('zero', zero)]:
+                assert new(rule)(tree) == old(rule)(tree)
+                t_old = min(repeat(lambda: old(rule)(tree), number=number,
+                                   repeat=3)) / number
+                t_new = min(repeat(lambda: new(rule)(tree), number=number,
+                                   repeat=3)) / number
+                print("%-12s %-14s %-10s %10.2fms %10.2fms %7.1fx" % (
+                      name, tname, rname, 1e3 * t_old, 1e3 * t_new,
+                      t_old / t_new))
+
+    tree = deep(10000)
+    for name, new, old in CASES:
+        try:
+            old(identity)(tree)
+            status = 'ok'
+        except RuntimeError:  # RecursionError
+            status = 'RecursionError'
+        t_new = min(repeat(lambda: new(zero)(tree), number=number,
+                           repeat=3)) / number
+        print("%-12s %-14s recursive: %s, iterative: %.2fms" % (
+              name, 'deep(10000)', status, 1e3 * t_new))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+""" Compiled strategy trees against the interpreted treeapply path """
+from __future__ import print_function
+from timeit import repeat
+
+from strategies.tree import greedy, allresults, brute, compile_tree
+
+inc = lambda x: x + 1
+dec = lambda x: x - 1
+double = lambda x: 2 * x
+half = lambda x: x // 2
+
+TREES = [
+    ('chain(20)', tuple([inc, double, dec, half] * 5)),
+    ('choice(8)', [inc, dec, double, half, (inc, inc), (dec, dec),
+                   (double, inc), (half, dec)]),
+    ('nested', ([inc, (dec, double)], [half, (inc, [double, dec])],
+                (inc, [dec, half]), [(double, dec), inc])),
+]
+
+SEMANTICS = [
+    ('greedy', lambda tree: greedy(tree),
+               lambda tree: compile_tree(tree, 'greedy')),
+    ('allresults', lambda tree: _list(allresults(tree)),
+                   lambda tree: _list(compile_tree(tree, 'allresults'))),
+    ('brute', lambda tree: brute(tree),
+              lambda tree: compile_tree(tree, 'brute')),
+]
+
+
+def _list(fn):
+    return lambda x: list(fn(x))
+
+
+def main(number=2000):
+    print("%-11s %-10s %12s %12s %8s" % (
+          'semantics', 'tree', 'treeapply', 'compiled', 'speedup'))
+    for name, interpreted, compiled in SEMANTICS:
+        for tname, tree in TREES:
+            old, new = interpreted(tree), compiled(tree)
+            t_new = min(repeat(lambda: new(7), number=number,
+                               repeat=3)) / number
+            try:
+                assert old(7) == new(7)
+                t_old = min(repeat(lambda: old(7), number=number,
+                                   repeat=3)) / number
+            except RuntimeError as e:
+                print("%-11s %-10s %12s %10.2fus" % (
+                      name, tname, type(e).__name__, 1e6 * t_new))
+                continue
+            print("%-11s %-10s %10.2fus %10.2fus %7.1fx" % (
+                  name, tname, 1e6 * t_old, 1e6 * t_new, t_old / t_new))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,607 @@
+""" Benchmark cases for every public combinator
+
+Each case is a function that builds its inputs and returns a zero-argument
+callable to be timed.  Cases are registered under a dotted name
+``module.combinator[input]``.
+"""
+import asyncio
+import time
+from io import StringIO
+from itertools import islice, product
+
+from strategies import (core, traverse, tree, branch, parallel, flat, rewrite,
+        aio, profiling)
+from strategies.branch.search import best_first, beam
+from strategies.branch import traverse as branch_traverse
+from strategies.term import (hashcons, head, operator, arguments, term,
+        split, rebuild, refresh)
+from . import trees
+
+CASES = []
+
+
+def case(name):
+    def register(setup):
+        CASES.append((name, setup))
+        return setup
+    return register
+
+
+inc = lambda x: x + 1 if isinstance(x, int) else x
+dec = lambda x: x - 1 if isinstance(x, int) else x
+double = lambda x: 2 * x
+posdec = lambda x: x - 1 if x > 0 else x
+zero = lambda x: 0 if x == 'x' else x
+
+
+def remove_double_neg(x):
+    if (isinstance(x, tuple) and x[0] == 'neg' and isinstance(x[1], tuple)
+            and x[1][0] == 'neg'):
+        return x[1][1]
+    return x
+
+
+def _inputs(terms=False):
+    # comparing deep nested tuples recurses, so strategies that compare
+    # results run on hash-consed terms, which compare by identity
+    deep = hashcons(trees.deep(3000)) if terms else trees.deep(3000)
+    return [('wide(2000)', trees.wide(2000)),
+            ('balanced(12)', trees.balanced(12)),
+            ('deep(3000)' + (' terms' if terms else ''), deep),
+            ('random(5000)', trees.random_tree(5000))]
+
+
+# core
+
+@case('core.exhaust[posdec]')
+def _():
+    return lambda: core.exhaust(posdec)(20000)
+
+@case('core.chain[100]')
+def _():
+    fn = core.chain([inc] * 100)
+    return lambda: [fn(i) for i in range(100)]
+
+@case('core.do_one[100]')
+def _():
+    fn = core.do_one([lambda x: x] * 99 + [inc])
+    return lambda: [fn(i) for i in range(100)]
+
+@case('core.condition')
+def _():
+    fn = core.condition(lambda x: x % 2 == 0, inc)
+    return lambda: [fn(i) for i in range(10000)]
+
+@case('core.minimize[10]')
+def _():
+    fn = core.minimize([lambda x, i=i: x * i % 7 for i in range(10)])
+    return lambda: [fn(i) for i in range(1000)]
+
+@case('core.switch')
+def _():
+    fn = core.switch(lambda x: x % 3, {0: inc, 1: dec})
+    return lambda: [fn(i) for i in range(10000)]
+
+@case('core.typed')
+def _():
+    fn = core.typed({int: inc, float: dec})
+    return lambda: [fn(i) for i in range(10000)]
+
+@case('core.null_safe')
+def _():
+    fn = core.null_safe(lambda x: None if x % 2 else x + 1)
+    return lambda: [fn(i) for i in range(10000)]
+
+@case('core.debug')
+def _():
+    fn = core.debug(inc, StringIO())
+    return lambda: [fn(i) for i in range(1000)]
+
+@case('core.indexed[200 rules]')
+def _():
+    rules = trees.head_rules(200)
+    fn = traverse.bottom_up(core.indexed(head, rules))
+    expr = trees.random_tree(2000)
+    return lambda: fn(expr)
+
+@case('core.do_one[200 rules]')
+def _():
+    rules = trees.head_rules(200)
+    fn = traverse.bottom_up(core.do_one([rl for _, rl in rules]))
+    expr = trees.random_tree(2000)
+    return lambda: fn(expr)
+
+@case('core.memoized[bottom_up, random(5000) terms, cold]')
+def _():
+    expr = hashcons(trees.random_tree(5000))
+    return lambda: traverse.bottom_up(core.memoized(remove_double_neg), expr)
+
+@case('core.memoized[bottom_up, random(5000) terms, warm]')
+def _():
+    expr = hashcons(trees.random_tree(5000))
+    fn = traverse.bottom_up(core.memoized(remove_double_neg, maxsize=None))
+    fn(expr)
+    return lambda: fn(expr)
+
+@case('core.bounded_exhaust[posdec, max_steps]')
+def _():
+    return lambda: core.bounded_exhaust(posdec, 20000, max_steps=10000)
+
+@case('core.cycle_exhaust[posdec]')
+def _():
+    return lambda: core.cycle_exhaust(posdec, 20000)
+
+@case('core.cycle_exhaust[cycle(10000)]')
+def _():
+    step = lambda x: (x + 1) % 10000
+    return lambda: core.cycle_exhaust(step, 0)
+
+
+# term protocol: a dispatch per call against the per-type fast path
+
+def _subterms(expr):
+    nodes, stack = [], [expr]
+    while stack:
+        node = stack.pop()
+        op, args = split(node)
+        if args:
+            nodes.append(node)
+            stack.extend(args)
+    return nodes
+
+@case('term.dispatch[random(5000)]')
+def _():
+    nodes = _subterms(trees.random_tree(5000))
+    def run():
+        for node in nodes:
+            term(operator(node), arguments(node))
+    return run
+
+@case('term.split_rebuild[random(5000)]')
+def _():
+    nodes = _subterms(trees.random_tree(5000))
+    def run():
+        refresh()
+        for node in nodes:
+            op, args = split(node)
+            rebuild(node, op, args)
+    return run
+
+
+# traverse
+
+def _traversal(name, fn, inputs=None):
+    for iname, expr in inputs or _inputs():
+        @case('traverse.%s[%s]' % (name, iname))
+        def _(expr=expr):
+            return lambda: fn(expr)
+
+for _name in ('top_down', 'bottom_up', 'top_down_memo', 'bottom_up_memo'):
+    _traversal(_name, getattr(traverse, _name)(zero))
+for _name in ('top_down_once', 'bottom_up_once', 'innermost', 'outermost'):
+    _traversal(_name, getattr(traverse, _name)(zero), _inputs(terms=True))
+
+_traversal('sall', traverse.sall(zero), [('wide(2000)', trees.wide(2000))])
+_traversal('top_down_memo', traverse.top_down_memo(zero),
+           [('dag(200) terms', hashcons(trees.dag(200)))])
+_traversal('exhaust(bottom_up)',
+           core.exhaust(traverse.bottom_up(remove_double_neg)),
+           [('deep(400)', trees.deep(400))])
+_traversal('innermost', traverse.innermost(remove_double_neg),
+           [('deep(400) rewrites', trees.deep(400))])
+
+
+@case('traverse.bottom_up[edited random(5000) terms, cold]')
+def _():
+    expr = hashcons(trees.random_tree(5000))
+    return lambda: traverse.bottom_up(zero, hashcons(('add', expr, 'x')))
+
+@case('traverse.RewriteCache.bottom_up[edited random(5000) terms, warm]')
+def _():
+    expr = hashcons(trees.random_tree(5000))
+    session = traverse.RewriteCache()
+    session.bottom_up(zero, expr)
+    return lambda: session.bottom_up(zero, hashcons(('add', expr, 'x')))
+
+
+# rewrite: hand-written rules tried one by one against one compiled RuleSet
+
+def _drop(op, i, c):
+    def rl(x):
+        if (isinstance(x, tuple) and len(x) == 3 and x[0] == op
+                and x[i] == c):
+            return x[3 - i]
+        return x
+    return rl
+
+def _pattern(op, i, c):
+    v = rewrite.Var('v')
+    return ((op, c, v) if i == 1 else (op, v, c)), v
+
+@case('rewrite.do_one[30 hand-written rules, random(5000)]')
+def _():
+    fn = traverse.bottom_up(core.do_one(
+        [_drop(*r) for r in trees.identity_rules()]))
+    expr = trees.random_tree(5000)
+    return lambda: fn(expr)
+
+@case('rewrite.RuleSet[30 rules, random(5000)]')
+def _():
+    fn = traverse.bottom_up(rewrite.RuleSet(
+        [_pattern(*r) for r in trees.identity_rules()]))
+    expr = trees.random_tree(5000)
+    return lambda: fn(expr)
+
+
+# branch
+
+@case('branch.exhaust[grid(40)]')
+def _():
+    brl = trees.grid(40)
+    return lambda: list(branch.exhaust(brl, (0, 0)))
+
+@case('branch.search[grid(40), bfs]')
+def _():
+    brl = trees.grid(40)
+    return lambda: list(branch.search(brl, (0, 0), order='bfs'))
+
+@case('branch.best_first[grid(40)]')
+def _():
+    brl = trees.grid(40)
+    return lambda: list(best_first(brl, (0, 0),
+                                   objective=lambda p: -sum(p)))
+
+@case('branch.beam[grid(40)]')
+def _():
+    brl = trees.grid(40)
+    return lambda: list(beam(brl, (0, 0), width=4,
+                             objective=lambda p: -sum(p)))
+
+def _ybrl(fn):
+    return branch.yieldify(fn)
+
+@case('branch.multiplex[20]')
+def _():
+    fn = branch.multiplex([_ybrl(lambda x, i=i: x + i % 5)
+                           for i in range(20)])
+    return lambda: [list(fn(i)) for i in range(1000)]
+
+@case('branch.chain[20]')
+def _():
+    fn = branch.chain([_ybrl(inc)] * 20)
+    return lambda: [list(fn(i)) for i in range(1000)]
+
+@case('branch.chain[1000]')
+def _():
+    fn = branch.chain([_ybrl(inc)] * 1000)
+    return lambda: [list(fn(i)) for i in range(100)]
+
+def _split(x):
+    yield x
+    yield x + 1
+
+@case('branch.chain[split * 12]')
+def _():
+    fn = branch.chain([_split] * 12)
+    return lambda: list(fn(0))
+
+@case('branch.chain[split * 12, unique]')
+def _():
+    fn = branch.chain([_split] * 12, unique=True)
+    return lambda: list(fn(0))
+
+@case('branch.do_one[20]')
+def _():
+    fn = branch.do_one([lambda x: iter(())] * 19 + [_ybrl(inc)])
+    return lambda: [list(fn(i)) for i in range(1000)]
+
+@case('branch.condition')
+def _():
+    fn = branch.condition(lambda x: x % 2 == 0, _ybrl(inc))
+    return lambda: [list(fn(i)) for i in range(10000)]
+
+@case('branch.sfilter')
+def _():
+    fn = branch.sfilter(lambda x: x % 2 == 0, lambda n: iter(range(n)))
+    return lambda: list(fn(100000))
+
+@case('branch.notempty')
+def _():
+    fn = branch.notempty(lambda x: iter(()))
+    return lambda: [list(fn(i)) for i in range(10000)]
+
+@case('branch.onaction')
+def _():
+    fn = branch.onaction(_ybrl(inc), lambda fn, x, y: None)
+    return lambda: [list(fn(i)) for i in range(10000)]
+
+@case('branch.memoized[grid(40), search]')
+def _():
+    brl = branch.memoized(trees.grid(40), maxsize=None)
+    return lambda: list(branch.search(brl, (0, 0)))
+
+@case('branch.bounded_exhaust[grid(40), max_states]')
+def _():
+    return lambda: list(branch.bounded_exhaust(trees.grid(40), (0, 0),
+                                               max_states=1000))
+
+@case('branch.indexed[200 rules]')
+def _():
+    fn = branch.indexed(type, [(float, branch.identity)] * 200 +
+                              [(int, _ybrl(inc))])
+    return lambda: [list(fn(i)) for i in range(10000)]
+
+def _commute(x):
+    if isinstance(x, tuple) and x[0] == 'add':
+        yield ('add', x[2], x[1])
+
+def _sum(n):
+    expr = 'x0'
+    for i in range(1, n):
+        expr = ('add', expr, 'x%d' % i)
+    return expr
+
+def _commute_anywhere(x):
+    for y in _commute(x):
+        yield y
+    if isinstance(x, tuple):
+        for i in range(1, len(x)):
+            for y in _commute_anywhere(x[i]):
+                yield x[:i] + (y,) + x[i + 1:]
+
+def _flip(x):
+    if x in (0, 1):
+        yield 1 - x
+        yield x
+
+def _eager_top_down(brl, x):
+    # the ad-hoc alternative: a full Cartesian product of child lists
+    nxs = list(brl(x)) or [x]
+    results = []
+    for nx in nxs:
+        if isinstance(nx, tuple):
+            kids = [_eager_top_down(brl, c) for c in nx[1:]]
+            results.extend((nx[0],) + args for args in product(*kids))
+        else:
+            results.append(nx)
+    return results
+
+@case('branch.traverse.top_down[balanced(4), all]')
+def _():
+    expr = trees.balanced(4)
+    expr = traverse.bottom_up(lambda x: x % 2 if isinstance(x, int) else x,
+                              expr)
+    return lambda: list(branch_traverse.top_down(_flip, expr))
+
+@case('branch.traverse.top_down[balanced(4), eager product]')
+def _():
+    expr = trees.balanced(4)
+    expr = traverse.bottom_up(lambda x: x % 2 if isinstance(x, int) else x,
+                              expr)
+    return lambda: _eager_top_down(_flip, expr)
+
+@case('branch.traverse.top_down[balanced(8), first 100]')
+def _():
+    expr = traverse.bottom_up(lambda x: x % 2 if isinstance(x, int) else x,
+                              trees.balanced(8))
+    return lambda: list(islice(branch_traverse.top_down(_flip, expr), 100))
+
+@case('branch.traverse.top_down[balanced(8), limit 100]')
+def _():
+    expr = traverse.bottom_up(lambda x: x % 2 if isinstance(x, int) else x,
+                              trees.balanced(8))
+    return lambda: list(branch_traverse.top_down(_flip, expr, limit=100))
+
+@case('branch.search[commute sum(10), every tree]')
+def _():
+    expr = _sum(10)
+    def run():
+        visited = set()
+        list(branch.search(_commute_anywhere, expr, visited=visited))
+        return len(visited)
+    return run
+
+@case('branch.saturate[commute sum(10)]')
+def _():
+    expr = _sum(10)
+    return lambda: list(branch.saturate(_commute, expr,
+                                        cost=lambda op, costs: 1 + sum(costs)))
+
+
+# tree
+
+def _strategy_tree():
+    return ([inc, dec, double], ([double, inc], [dec, (inc, double)]),
+            [(inc, inc), dec])
+
+@case('tree.treeapply')
+def _():
+    t = _strategy_tree()
+    return lambda: tree.treeapply(t, {list: max, tuple: min},
+                                  leaf=lambda fn: fn(3))
+
+@case('tree.greedy')
+def _():
+    fn = tree.greedy(_strategy_tree())
+    return lambda: [fn(i) for i in range(1000)]
+
+def _simplify_tree():
+    # alternatives often leave the expression unchanged, so results repeat
+    # across choices and their objective can be reused
+    same = lambda x: x
+    steps = [traverse.bottom_up(zero), traverse.top_down(remove_double_neg),
+             same]
+    return tuple([list(steps)] * 4)
+
+@case('tree.greedy[nodes objective, random(5000) terms]')
+def _():
+    from strategies.profiling import nodes
+    fn = tree.greedy(_simplify_tree(), objective=nodes)
+    expr = hashcons(trees.random_tree(5000))
+    return lambda: fn(expr)
+
+@case('tree.greedy[nodes objective, random(5000) terms, cache]')
+def _():
+    from strategies.profiling import nodes
+    fn = tree.greedy(_simplify_tree(), objective=nodes, cache=100)
+    expr = hashcons(trees.random_tree(5000))
+    return lambda: fn(expr)
+
+@case('tree.greedy[lookahead=2]')
+def _():
+    fn = tree.greedy(_strategy_tree(), lookahead=2)
+    return lambda: [fn(i) for i in range(1000)]
+
+@case('tree.allresults')
+def _():
+    fn = tree.allresults(_strategy_tree())
+    return lambda: [list(fn(i)) for i in range(1000)]
+
+@case('tree.brute')
+def _():
+    fn = tree.brute(_strategy_tree())
+    return lambda: [fn(i) for i in range(1000)]
+
+@case('tree.compile_tree[greedy]')
+def _():
+    fn = tree.compile_tree(_strategy_tree())
+    return lambda: [fn(i) for i in range(1000)]
+
+@case('tree.compile_tree[brute]')
+def _():
+    fn = tree.compile_tree(_strategy_tree(), 'brute')
+    return lambda: [fn(i) for i in range(1000)]
+
+@case('tree.best_first')
+def _():
+    fn = tree.best_first(_strategy_tree())
+    return lambda: [fn(i) for i in range(1000)]
+
+@case('tree.beam')
+def _():
+    fn = tree.beam(_strategy_tree(), width=3)
+    return lambda: [fn(i) for i in range(1000)]
+
+
+# parallel
+
+def _remove_double_negs(expr):
+    return traverse.bottom_up(remove_double_neg)(expr)
+
+@case('parallel.batch[2000 x random(200), serial]')
+def _():
+    exprs = [trees.random_tree(200, seed=i) for i in range(2000)]
+    return lambda: list(parallel.batch(_remove_double_negs, exprs,
+                                       processes=1))
+
+@case('parallel.batch[2000 x random(200), pool]')
+def _():
+    exprs = [trees.random_tree(200, seed=i) for i in range(2000)]
+    return lambda: list(parallel.batch(_remove_double_negs, exprs))
+
+
+def _slow_inc(x):
+    # stands in for a rule that waits, e.g. on I/O
+    time.sleep(0.001)
+    return x + 1
+
+def _slow_brl(x):
+    time.sleep(0.001)
+    return [x + 1, x - 1]
+
+@case('parallel.pminimize[8 x 1ms, serial]')
+def _():
+    fn = parallel.pminimize([_slow_inc] * 8, cutoff=100)
+    return lambda: fn(0)
+
+@case('parallel.pminimize[8 x 1ms, threads]')
+def _():
+    fn = parallel.pminimize([_slow_inc] * 8, max_workers=8)
+    return lambda: fn(0)
+
+@case('parallel.pmultiplex[8 x 1ms, serial]')
+def _():
+    fn = parallel.pmultiplex([_slow_brl] * 8, cutoff=100)
+    return lambda: list(fn(0))
+
+@case('parallel.pmultiplex[8 x 1ms, threads]')
+def _():
+    fn = parallel.pmultiplex([_slow_brl] * 8, max_workers=8)
+    return lambda: list(fn(0))
+
+
+# flat
+
+@case('flat.flatten[random(50000)]')
+def _():
+    expr = trees.random_tree(50000)
+    return lambda: flat.flatten(expr)
+
+@case('flat.select[random(50000)]')
+def _():
+    t = flat.flatten(trees.random_tree(50000))
+    return lambda: t.select(['neg'])
+
+@case('flat.select[random(50000), tuples]')
+def _():
+    expr = trees.random_tree(50000)
+    return lambda: [n for n in _subterms(expr) if head(n) == 'neg']
+
+@case('flat.bottom_up[random(50000), heads]')
+def _():
+    t = flat.flatten(trees.random_tree(50000))
+    return lambda: flat.bottom_up(remove_double_neg, t, heads=['neg'])
+
+@case('flat.bottom_up[random(50000), tuples]')
+def _():
+    expr = trees.random_tree(50000)
+    return lambda: traverse.bottom_up(remove_double_neg, expr)
+
+
+# aio
+
+async def _async_zero(x):
+    await asyncio.sleep(0)
+    return zero(x)
+
+async def _async_slow_inc(x):
+    await asyncio.sleep(0.001)
+    return x + 1
+
+@case('aio.bottom_up[random(2000)]')
+def _():
+    expr = trees.random_tree(2000)
+    return lambda: asyncio.run(aio.bottom_up(_async_zero, expr))
+
+@case('aio.bottom_up[random(2000), 8 workers]')
+def _():
+    expr = trees.random_tree(2000)
+    return lambda: asyncio.run(aio.bottom_up(_async_zero, expr, workers=8))
+
+@case('aio.minimize[8 x 1ms]')
+def _():
+    return lambda: asyncio.run(aio.minimize([_async_slow_inc] * 8, 0))
+
+@case('aio.multiplex[8 x 1ms]')
+def _():
+    async def brl(x):
+        await asyncio.sleep(0.001)
+        return [x + 1, x - 1]
+    return lambda: asyncio.run(aio.multiplex([brl] * 8, 0))
+
+
+# profiling
+
+@case('profiling.Profiler[bottom_up, random(5000)]')
+def _():
+    expr = trees.random_tree(5000)
+    fn = traverse.bottom_up(profiling.Profiler().rule(remove_double_neg))
+    return lambda: fn(expr)
+
+@case('profiling.Profiler[bottom_up, random(5000), disabled]')
+def _():
+    expr = trees.random_tree(5000)
+    prof = profiling.Profiler()
+    fn = traverse.bottom_up(prof.rule(remove_double_neg))
+    prof.enabled = False
+    return lambda: fn(expr)
@@ -0,0 +1,96 @@
+""" Synthetic inputs for benchmarks
+
+All generators are deterministic so runs on different commits see the same
+inputs.
+"""
+import random
+
+
+def deep(depth, leaf='x'):
+    """ A chain ('neg', ('neg', ... leaf)) """
+    expr = leaf
+    for i in range(depth):
+        expr = ('neg', expr)
+    return expr
+
+
+def wide(width):
+    """ One node with many small children """
+    return ('add',) + tuple(('mul', i, 'x') for i in range(width))
+
+
+def balanced(depth, leaf=None):
+    """ A full binary tree with distinct leaves, or every leaf leaf """
+    counter = [0]
+    def build(d):
+        if d == 0:
+            if leaf is not None:
+                return leaf
+            counter[0] += 1
+            return counter[0]
+        return ('add', build(d - 1), build(d - 1))
+    return build(depth)
+
+
+def dag(depth):
+    """ A binary tree whose two children are the same object
+
+    Has 2**depth paths but only depth + 1 distinct subterms.
+    """
+    expr = 'x'
+    for i in range(depth):
+        expr = ('add', expr, expr)
+    return expr
+
+
+OPS = ('add', 'mul', 'sub', 'neg', 'pow')
+
+
+def random_tree(size, seed=0, ops=OPS):
+    """ A random tree with about size nodes """
+    rng = random.Random(seed)
+    def build(n):
+        if n <= 1:
+            return rng.choice(['x', 'y', 0, 1, 2])
+        k = rng.randint(1, min(3, n - 1))
+        sizes = [(n - 1) // k] * k
+        return (rng.choice(ops),) + tuple(build(s) for s in sizes)
+    return build(size)
+
+
+def head_rules(n, ops=OPS):
+    """ n rules, each rewriting a distinct operator that never occurs
+
+    Plus one rule per real operator at the end, so every node is tested
+    against every rule before something applies.  Returns (key, rule) pairs.
+    """
+    def make(op, new):
+        def rl(x):
+            if isinstance(x, tuple) and x[0] == op:
+                return (new,) + x[1:]
+            return x
+        rl.__name__ = 'rl_%s' % op
+        return rl
+    rules = [('op%d' % i, make('op%d' % i, 'never')) for i in range(n)]
+    rules += [(op, make(op, op.upper())) for op in ops]
+    return rules
+
+
+def grid(n):
+    """ A branching rule over an n x n grid of states """
+    def brl(pos):
+        i, j = pos
+        if i < n:
+            yield (i + 1, j)
+        if j < n:
+            yield (i, j + 1)
+    return brl
+
+
+def identity_rules(ops=OPS, constants=(0, 1, 2)):
+    """ (op, position, constant) triples, one per rule ``op(.., c, ..) -> ..``
+
+    Rules that drop a constant argument of a binary operator, as a simplifier
+    of identities like ``x + 0`` would have.
+    """
+    return [(op, i, c) for op in ops for c in constants for i in (1, 2)]
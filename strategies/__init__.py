@@ -19,9 +19,16 @@ Submodules
 
 strategies.core       - generic non-SymPy specific strategies
 strategies.traverse   - strategies that traverse a SymPy tree
+strategies.term       - the term protocol and hash-consed terms
+strategies.profiling  - per-rule call counts and timings
+strategies.parallel   - apply a strategy to many expressions across processes
+strategies.aio        - strategies for coroutine rules, run concurrently
+strategies.flat       - compact array-backed trees with vectorized scans
+strategies.rewrite    - pattern rewrite rules compiled into one matcher
 strategies.tools      - some conglomerate strategies that do depend on SymPy
 """
 
-from .core import condition, debug, chain, do_one, exhaust, minimize
+from .core import (condition, debug, chain, do_one, exhaust, minimize,
+        indexed, memoized, bounded_exhaust, cycle_exhaust)
 from .tools import typed
 from . import branch
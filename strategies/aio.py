@@ -0,0 +1,261 @@
+""" Strategies for rules that are coroutines
+
+Rules here may be plain functions or coroutine functions, e.g. rules that
+ask a solver or a cache over the network.  Every strategy is a coroutine
+function, so it is itself such a rule and strategies nest as in
+``strategies.core``.
+
+Independent work runs concurrently: the children of a node in a traversal
+and the alternatives of ``do_one``, ``minimize`` and ``multiplex``.  Wrap a
+rule with ``limit`` to bound how many of its calls are in flight at once.
+Give these strategies ``workers``, a number or a ``Workers`` shared between
+them, to bound how many tasks they run at once; by default there is a task
+per child or alternative, so a large tree starts a task per node.
+
+Unlike those of ``strategies.traverse`` these traversals recurse, a few
+coroutines per level of the tree, so their depth is bounded by the
+recursion limit.
+
+>>> import asyncio
+>>> from strategies.aio import bottom_up, exhaust
+>>> async def posdec(x):
+...     await asyncio.sleep(0)  # e.g. a remote call
+...     return x - 1 if isinstance(x, int) and x > 0 else x
+>>> asyncio.run(exhaust(bottom_up(posdec))(('add', 2, ('mul', 3, 1))))
+('add', 0, ('mul', 0, 0))
+"""
+import asyncio
+from inspect import isawaitable
+
+from toolz import curry, identity
+
+from .traverse import _split, _rebuild
+from .term import refresh
+
+
+async def _call(rule, x):
+    """ Call a plain or coroutine rule """
+    result = rule(x)
+    if isawaitable(result):
+        result = await result
+    return result
+
+
+def _changed(result, x):
+    return result is not x and result != x
+
+
+class Workers(object):
+    """ A bound on the tasks that strategies run at once
+
+    ``Workers(n)`` lets at most n tasks, counting the caller, work at once.
+    Work beyond that runs in the task that asked for it, one piece after
+    another, instead of waiting for a free worker, so nested strategies that
+    share a ``Workers`` cannot deadlock.
+
+    >>> import asyncio
+    >>> from strategies.aio import bottom_up, Workers
+    >>> inc = lambda x: x + 1 if isinstance(x, int) else x
+    >>> asyncio.run(bottom_up(inc, ('add', 1, ('mul', 2, 3)), workers=2))
+    ('add', 2, ('mul', 3, 4))
+    """
+    def __init__(self, n):
+        self.free = n - 1
+
+    def _done(self, task):
+        self.free += 1
+
+
+def _workers(workers):
+    if workers is None or isinstance(workers, Workers):
+        return workers
+    return Workers(workers)
+
+
+def _start(coroutine, workers):
+    """ A task running coroutine, or if no worker is free the coroutine
+    itself, to be awaited in place """
+    if workers is None:
+        return asyncio.ensure_future(coroutine)
+    if workers.free > 0:
+        workers.free -= 1
+        task = asyncio.ensure_future(coroutine)
+        task.add_done_callback(workers._done)
+        return task
+    return coroutine
+
+
+def _stop(started):
+    if isinstance(started, asyncio.Future):
+        started.cancel()
+    else:
+        started.close()
+
+
+async def _all(coroutines, workers):
+    """ Run coroutines concurrently as workers allow; their results in order
+    """
+    if workers is None:
+        return list(await asyncio.gather(*coroutines))
+    results, tasks = [], []
+    for coroutine in coroutines:
+        started = _start(coroutine, workers)
+        if started is coroutine:
+            results.append(await coroutine)
+        else:
+            tasks.append((len(results), started))
+            results.append(None)
+    for i, task in tasks:
+        results[i] = await task
+    return results
+
+
+def limit(rule, n):
+    """ Allow at most n calls of rule to run at once
+
+    The semaphore is created on the first call so that it belongs to the
+    running event loop.
+    """
+    semaphore = []
+
+    async def limited_rl(x):
+        if not semaphore:
+            semaphore.append(asyncio.Semaphore(n))
+        async with semaphore[0]:
+            return await _call(rule, x)
+    limited_rl.__name__ = getattr(rule, '__name__', 'limited_rl')
+    return limited_rl
+
+
+@curry
+async def exhaust(rule, x):
+    """ Apply a rule repeatedly until it has no effect """
+    new, old = await _call(rule, x), x
+    while _changed(new, old):
+        new, old = await _call(rule, new), new
+    return new
+
+
+@curry
+async def condition(cond, rule, x):
+    """ Only apply rule if condition, possibly a coroutine, is true """
+    if await _call(cond, x):
+        return await _call(rule, x)
+    return x
+
+
+@curry
+async def chain(rules, x):
+    """ Sequentially apply a sequence of rules """
+    for rule in rules:
+        x = await _call(rule, x)
+    return x
+
+
+@curry
+async def do_one(rules, x, workers=None):
+    """ Return the result of the first rule that works
+
+    All rules are started at once, or as many as ``workers`` allows with the
+    rest tried in turn.  Once a rule has an effect, the rules after it are
+    cancelled; the result is the same as trying them in order.
+    """
+    workers = _workers(workers)
+    started = [_start(_call(rule, x), workers) for rule in rules]
+    try:
+        for task in started:
+            result = await task
+            if _changed(result, x):
+                return result
+        return x
+    finally:
+        for task in started:
+            _stop(task)
+
+
+@curry
+async def minimize(rules, x, **kwargs):
+    """ Select result of rules, run concurrently, that minimizes objective
+
+    Takes the keyword inputs ``objective`` and ``workers``.
+    """
+    objective = kwargs.get('objective', identity)
+    results = await _all((_call(rule, x) for rule in rules),
+                         _workers(kwargs.get('workers')))
+    return min(results, key=objective)
+
+
+@curry
+async def multiplex(brls, x, workers=None):
+    """ Multiplex many branching rules into one
+
+    A branching rule may return an iterable, an async iterable or an
+    awaitable of an iterable.  All are run concurrently; the unique results
+    are returned as a list in the order ``strategies.branch.multiplex``
+    yields them.
+    """
+    results = await _all((_drain(brl, x) for brl in brls), _workers(workers))
+    seen, unique = set(), []
+    for nxs in results:
+        for nx in nxs:
+            if nx not in seen:
+                seen.add(nx)
+                unique.append(nx)
+    return unique
+
+
+async def _drain(brl, x):
+    results = brl(x)
+    if isawaitable(results):
+        results = await results
+    if hasattr(results, '__aiter__'):
+        return [nx async for nx in results]
+    return list(results)
+
+
+@curry
+async def sall(rule, expr, workers=None):
+    """ Strategic all - apply rule to all args concurrently """
+    refresh()
+    op, children = _split(expr)
+    if not children:
+        return expr
+    new = await _all((_call(rule, child) for child in children),
+                     _workers(workers))
+    return _rebuild(expr, op, children, new)
+
+
+@curry
+async def top_down(rule, x, workers=None):
+    """ Apply a rule down a tree running it on the top nodes first """
+    workers = _workers(workers)
+    return await sall(top_down(rule, workers=workers), await _call(rule, x),
+                      workers=workers)
+
+
+@curry
+async def bottom_up(rule, x, workers=None):
+    """ Apply a rule down a tree running it on the bottom nodes first """
+    workers = _workers(workers)
+    return await _call(rule, await sall(bottom_up(rule, workers=workers), x,
+                                        workers=workers))
+
+
+@curry
+async def top_down_once(rule, x, workers=None):
+    """ Apply a rule down a tree - stop on success """
+    workers = _workers(workers)
+    result = await _call(rule, x)
+    if _changed(result, x):
+        return result
+    return await sall(top_down(rule, workers=workers), x, workers=workers)
+
+
+@curry
+async def bottom_up_once(rule, x, workers=None):
+    """ Apply a rule up a tree - stop on success """
+    workers = _workers(workers)
+    result = await sall(bottom_up(rule, workers=workers), x, workers=workers)
+    if _changed(result, x):
+        return result
+    return await _call(rule, x)
@@ -1,2 +1,4 @@
 from .core import (condition, debug, multiplex, exhaust, notempty,
-        chain, onaction, sfilter, yieldify, do_one, identity)
+        chain, onaction, sfilter, yieldify, do_one, identity, indexed, memoized)
+from .search import search, bounded_exhaust
+from .egraph import EGraph, saturate
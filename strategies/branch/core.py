@@ -1,39 +1,39 @@
 """ Generic SymPy-Independent Strategies """
 from toolz import curry, filter
+from ..core import _index, _missing, _memo_key
+from ..cache import LRUCache, WeakLRUCache
+from .search import search
 
 def identity(x):
     yield x
 
 @curry
 def exhaust(fn, x):
-    """ Apply a branching rule repeatedly until it has no effect """
-    seen = set([x])
-    for nx in fn(x):
-        if nx not in seen:
-            seen.add(nx)
-            for nnx in exhaust(fn, nx):
-                yield nnx
-    if seen == set([x]):
-        yield x
+    """ Apply a branching rule repeatedly until it has no effect
+
+    See Also:
+        strategies.branch.search.search
+    """
+    return search(fn, x)
 
 @curry
 def onaction(fn, action, x):
     for result in fn(x):
-        if result != x:
+        if result is not x and result != x:
             action(fn, x, result)
         yield result
 
 def debug(fn, file=None):
     """ Print the input and output expressions at each rule application """
+    return onaction(fn, _write(file))
+
+@curry
+def _write(file, brl, x, result):
     if not file:
         from sys import stdout
         file = stdout
-
-    def write(brl, x, result):
-        file.write("Rule: %s\n"%brl.__name__)
-        file.write("In: %s\nOut: %s\n\n"%(x, result))
-
-    return onaction(fn, write)
+    file.write("Rule: %s\n"%brl.__name__)
+    file.write("In: %s\nOut: %s\n\n"%(x, result))
 
 @curry
 def multiplex(fns, x):
@@ -78,21 +78,106 @@ def do_one(fns, x):
             yielded = True
             yield nx
         if yielded:
-            raise StopIteration()
+            return
+
+def indexed(key, brls):
+    """ Execute one of the branching rules indexed under key(x)
+
+    inputs:
+        key  -- a function from expression to index key, e.g. term.head
+        brls -- a sequence of (k, brl) pairs.  A branching rule is tried on x
+                only if k == key(x) or if k is None.
+
+    Has the semantics of ``do_one`` over the selected branching rules.
+    """
+    table, default = _index(brls)
+    return _indexed(key, table, default)
+
+@curry
+def _indexed(key, table, default, x):
+    try:
+        fns = table.get(key(x), default)
+    except TypeError:  # unhashable key
+        fns = default
+    for brl in fns:
+        yielded = False
+        for nx in brl(x):
+            yielded = True
+            yield nx
+        if yielded:
+            return
+
+def memoized(brl, maxsize=1024, weak=False):
+    """ Cache the results of a branching rule as lists
+
+    The first call on an expression runs the branching rule to completion;
+    later calls yield from the stored list.
+
+    See Also:
+        strategies.core.memoized
+    """
+    cache = WeakLRUCache(maxsize) if weak else LRUCache(maxsize)
+
+    def memoized_brl(x):
+        try:
+            key = _memo_key(x, weak)
+            results = cache.get(key, _missing)
+        except TypeError:  # unhashable, or a tuple tree in a weak cache
+            results = brl(x)
+        else:
+            if results is _missing:
+                results = list(brl(x))
+                cache[key] = results
+        for nx in results:
+            yield nx
+    memoized_brl.__name__ = getattr(brl, '__name__', 'memoized_brl')
+    memoized_brl.cache = cache
+    memoized_brl.clear = cache.clear
+    memoized_brl.info = cache.info
+    return memoized_brl
 
 @curry
-def chain(fns, x):
+def chain(fns, x, unique=False):
     """
     Compose a sequence of fns so that they apply to the expr sequentially
+
+    Runs on an explicit stack of one iterator per stage, so each result costs
+    the same however many stages there are and chains of any length work.
+    Stages are advanced lazily, depth first.
+
+    If ``unique`` is true each stage skips results it has already produced,
+    which also prunes the work later stages would repeat on them.
+
+    >>> from strategies.branch import chain
+    >>> def inc_or_dec(x):
+    ...     yield x + 1
+    ...     yield x - 1
+    >>> list(chain([inc_or_dec, inc_or_dec], 0))
+    [2, 0, 0, -2]
+    >>> list(chain([inc_or_dec, inc_or_dec], 0, unique=True))
+    [2, 0, -2]
     """
-    if not fns:
+    fns = tuple(fns)
+    n = len(fns)
+    if not n:
         yield x
-        raise StopIteration()
-
-    head, tail = fns[0], fns[1:]
-    for nx in head(x):
-        for nnx in chain(tail)(nx):
-            yield nnx
+        return
+    seen = [set() for fn in fns] if unique else None
+    stack = [iter(fns[0](x))]
+    while stack:
+        nx = next(stack[-1], _missing)
+        if nx is _missing:
+            stack.pop()
+            continue
+        depth = len(stack)
+        if unique:
+            if nx in seen[depth - 1]:
+                continue
+            seen[depth - 1].add(nx)
+        if depth == n:
+            yield nx
+        else:
+            stack.append(iter(fns[depth](nx)))
 
 
 @curry
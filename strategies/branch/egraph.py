@@ -0,0 +1,320 @@
+""" Equality saturation over an e-graph
+
+An e-graph stores many equivalent expressions compactly.  Nodes (e-nodes)
+hold an operator and the equivalence classes (e-classes) of their arguments
+rather than the arguments themselves, so a subterm shared by many equivalent
+expressions is stored once, and rewriting a subterm makes every expression
+that contains it equivalent to its rewritten form at once.
+
+``saturate`` applies branching rules to an expression through an e-graph,
+rather than listing every equivalent expression as a separate tree as
+``exhaust`` and ``multiplex`` do, and then extracts the best one.
+"""
+from itertools import islice, product
+
+from toolz import curry
+
+from ..term import split, rebuild, refresh, args_like
+from .traverse import _product
+
+
+class EGraph(object):
+    """ A set of expressions partitioned into equivalence classes
+
+    ``width`` is the number of expressions kept as examples of each e-class,
+    which are what branching rules see during ``saturate``.
+
+    >>> from strategies.branch.egraph import EGraph
+    >>> g = EGraph()
+    >>> a = g.add(('add', 'x', 0))
+    >>> b = g.add('x')
+    >>> g.union(a, b)
+    True
+    >>> g.rebuild()
+    >>> g.find(g.add(('mul', ('add', 'x', 0), 2))) == \\
+    ...     g.find(g.add(('mul', 'x', 2)))
+    True
+    """
+    def __init__(self, width=4):
+        self.width = width
+        self.parent = []
+        # e-nodes are (op, argument e-classes), or ((type, leaf), None) for
+        # a leaf so that equal leaves of different types, e.g. 1, 1.0 and
+        # True, are kept apart
+        self.memo = dict()     # e-node -> e-class id
+        self.samples = dict()  # e-node -> an expression it was built from
+        self.members = dict()  # e-class id -> expressions known to be in it
+
+    def find(self, i):
+        """ The canonical id of the e-class of i """
+        parent = self.parent
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
+        return root
+
+    def _canonical(self, enode):
+        op, args = enode
+        if args is None:
+            return enode
+        return (op, tuple(self.find(a) for a in args))
+
+    def _add_node(self, enode, sample):
+        enode = self._canonical(enode)
+        i = self.memo.get(enode)
+        if i is None:
+            i = len(self.parent)
+            self.parent.append(i)
+            self.memo[enode] = i
+            self.samples[enode] = sample
+        return self.find(i)
+
+    def add(self, expr):
+        """ Add an expression and its subterms.  Returns its e-class id """
+        refresh()
+        ids = dict()  # id(subterm) -> e-class, for shared subterms
+        stack = [(expr, False)]
+        results = []
+        while stack:
+            node, closing = stack.pop()
+            if closing:
+                op, args = split(node)
+                n = len(args)
+                kids = tuple(results[len(results) - n:])
+                del results[len(results) - n:]
+                i = self._add_node((op, kids), node)
+                self._remember(i, node)
+                ids[id(node)] = i
+                results.append(i)
+                continue
+            if id(node) in ids:
+                results.append(ids[id(node)])
+                continue
+            op, args = split(node)
+            if args is None:
+                i = self._add_node(((type(node), node), None), node)
+                self._remember(i, node)
+                results.append(i)
+                continue
+            stack.append((node, True))
+            for a in reversed(args):
+                stack.append((a, False))
+        return results[-1]
+
+    def _remember(self, i, expr):
+        members = self.members.setdefault(self.find(i), [])
+        if len(members) < self.width and expr not in members:
+            members.append(expr)
+
+    def union(self, a, b):
+        """ Merge the e-classes of a and b.  True if they were distinct
+
+        Call ``rebuild`` after a batch of unions to restore congruence.
+        """
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return False
+        if b < a:
+            a, b = b, a
+        self.parent[b] = a
+        members = self.members.pop(b, [])
+        for expr in members:
+            self._remember(a, expr)
+        return True
+
+    def rebuild(self):
+        """ Merge e-classes with congruent e-nodes until none remain
+
+        E-nodes whose operators are equal and whose arguments are in equal
+        e-classes are equal; unions can make new pairs congruent, so this is
+        repeated to a fixpoint.
+        """
+        changed = True
+        while changed:
+            changed = False
+            memo, samples = dict(), dict()
+            for enode, i in self.memo.items():
+                canon = self._canonical(enode)
+                i = self.find(i)
+                j = memo.get(canon)
+                if j is not None and self.find(j) != i:
+                    self.union(i, j)
+                    changed = True
+                memo[canon] = self.find(i)
+                samples.setdefault(canon, self.samples[enode])
+            self.memo, self.samples = memo, samples
+
+    def classes(self):
+        """ A dict mapping each canonical e-class id to its e-nodes """
+        result = dict()
+        for enode, i in self.memo.items():
+            result.setdefault(self.find(i), []).append(enode)
+        return result
+
+    def __len__(self):
+        """ The number of e-nodes """
+        return len(self.memo)
+
+    def _build(self, enode, args):
+        op, kids = enode
+        if kids is None:
+            return op[1]
+        sample = self.samples[enode]
+        return rebuild(sample, op, args_like(split(sample)[1], args))
+
+    def extract(self, i, cost=None):
+        """ The expression of least cost in the e-class of i
+
+        ``cost(op, arg_costs)`` gives the cost of a node from the costs of
+        its arguments; for a leaf ``op`` is the leaf itself and
+        ``arg_costs`` is empty.  The default counts nodes.  Costs must be
+        monotone, i.e. a node costs more than any of its arguments.
+        """
+        cost = cost or _size
+        classes = self.classes()
+        best = dict()  # e-class -> (cost, e-node)
+        changed = True
+        while changed:
+            changed = False
+            for c, enodes in classes.items():
+                for enode in enodes:
+                    op, kids = enode
+                    if kids is None:
+                        op, kids = op[1], ()
+                    if not all(self.find(k) in best for k in kids):
+                        continue
+                    k = cost(op, [best[self.find(k)][0] for k in kids])
+                    if c not in best or k < best[c][0]:
+                        best[c] = (k, enode)
+                        changed = True
+        return self._materialize(self.find(i), best)
+
+    def _materialize(self, c, best):
+        # iterative so that deep expressions do not hit the recursion limit
+        stack, results = [(c, False)], []
+        while stack:
+            c, closing = stack.pop()
+            enode = best[c][1]
+            kids = enode[1] or ()
+            if closing or not kids:
+                n = len(kids)
+                args = results[len(results) - n:] if n else []
+                del results[len(results) - n:]
+                results.append(self._build(enode, args))
+                continue
+            stack.append((c, True))
+            for k in reversed(kids):
+                stack.append((self.find(k), False))
+        return results[-1]
+
+    def terms(self, i, depth=None):
+        """ Lazily enumerate the distinct expressions in the e-class of i
+
+        Cyclic e-classes represent infinitely many expressions; expressions
+        that pass through the same e-class twice are skipped, and ``depth``
+        bounds the nesting of the rest.
+        """
+        return self._terms(self.find(i), self.classes(), frozenset(), depth)
+
+    def _terms(self, c, classes, path, depth):
+        if depth is not None and depth < 0:
+            return
+        path = path | frozenset([c])
+        seen = set()
+        for enode in classes[c]:
+            kids = enode[1]
+            if kids is None:
+                results = [enode[0][1]]
+            else:
+                kids = [self.find(k) for k in kids]
+                if any(k in path for k in kids):
+                    continue
+                sub = None if depth is None else depth - 1
+                # the product reads each child's expressions lazily, and
+                # only once, so the first results come out at once
+                results = (self._build(enode, args) for args in _product(
+                    [self._terms(k, classes, path, sub) for k in kids]))
+            for expr in results:
+                if expr not in seen:
+                    seen.add(expr)
+                    yield expr
+
+    def saturate(self, brls, iterations=10, max_nodes=10000):
+        """ Apply branching rules to every e-class until nothing new is found
+
+        Branching rules act on expressions, so each e-node is instantiated
+        as up to ``width`` expressions built from the example expressions of
+        its argument classes.  Every result of a rule is added to the e-graph
+        and merged with the class of its input.
+
+        Stops after ``iterations`` rounds or once the e-graph holds more than
+        ``max_nodes`` e-nodes.  Returns the number of rounds run.
+        """
+        for n in range(iterations):
+            if len(self) > max_nodes:
+                return n
+            changed = False
+            for c, enodes in list(self.classes().items()):
+                for enode in enodes:
+                    for expr in self._instances(enode):
+                        self._remember(c, expr)
+                        for brl in brls:
+                            for new in brl(expr):
+                                changed = self.union(c, self.add(new)) or changed
+            self.rebuild()
+            if not changed:
+                return n + 1
+        return iterations
+
+    def _instances(self, enode):
+        kids = enode[1]
+        if kids is None:
+            return [enode[0][1]]
+        options = [self.members[self.find(k)] for k in kids]
+        return [self._build(enode, list(args))
+                for args in islice(product(*options), self.width)]
+
+
+def _size(op, costs):
+    return 1 + sum(costs)
+
+
+@curry
+def saturate(brls, x, objective=None, cost=None, iterations=10,
+             width=4, max_nodes=10000, limit=10000):
+    """ Yield the best expression equivalent to x under branching rules
+
+    The rules are applied by equality saturation in an ``EGraph``.  By
+    default the result is the best in the whole e-graph by ``cost``, an
+    additive cost per node that counts nodes unless given (see
+    ``EGraph.extract``).
+
+    Given an ``objective`` and no ``cost``, the result is instead the best by
+    ``objective``, as ``brute`` and ``minimize`` choose, among only the first
+    ``limit`` distinct equivalent expressions.  It need not be the best in the
+    e-graph, which may hold many more.
+
+    inputs:
+        brls  -- a branching rule or a list of them
+
+    >>> from strategies.branch.egraph import saturate
+    >>> def commute(x):
+    ...     if isinstance(x, tuple) and x[0] == 'add':
+    ...         yield ('add', x[2], x[1])
+    >>> def zero(x):
+    ...     if isinstance(x, tuple) and x[0] == 'add' and x[1] == 0:
+    ...         yield x[2]
+    >>> list(saturate([commute, zero], ('mul', ('add', 'y', 0), 2)))
+    [('mul', 'y', 2)]
+    """
+    if callable(brls):
+        brls = [brls]
+    g = EGraph(width)
+    root = g.add(x)
+    g.saturate(brls, iterations=iterations, max_nodes=max_nodes)
+    if cost is not None or objective is None:
+        yield g.extract(root, cost)
+    else:
+        yield min(islice(g.terms(root), limit), key=objective)
@@ -0,0 +1,268 @@
+""" Search the expressions reachable by a branching rule """
+from collections import deque
+from heapq import heappush, heappop, nsmallest
+from itertools import count
+from functools import partial
+from toolz import curry, identity
+from ..core import _Budget
+
+
+@curry
+def search(fn, x, order='dfs', visited=None):
+    """ Yield the expressions reachable from x on which fn has no effect
+
+    The search is iterative and keeps one ``visited`` set for the whole
+    search, so every expression is expanded at most once, cycles terminate,
+    and no expression is yielded twice.
+
+    inputs:
+        order   -- 'dfs' (depth first) or 'bfs' (breadth first)
+        visited -- a set-like object supporting ``add`` and ``in``.  Defaults
+                   to a new set.  Pass a ``strategies.cache.LRUSet`` or
+                   ``BloomFilter`` to bound memory.  An LRUSet may re-expand
+                   forgotten expressions; a BloomFilter may skip expressions
+                   it wrongly reports as seen.
+
+    >>> from strategies.branch.search import search
+    >>> def step(x):  # walk down to 0 or up to 10, cycling 0 <-> 1
+    ...     if 0 < x < 5:  yield x - 1
+    ...     if 1 < x < 10: yield x + 1
+    ...     if x == 0:     yield 1
+    >>> sorted(search(step, 3))
+    [10]
+    >>> list(search(step, 7, order='bfs'))
+    [10]
+    """
+    if visited is None:
+        visited = set()
+    if order == 'dfs':
+        return _dfs(fn, x, visited)
+    elif order == 'bfs':
+        return _bfs(fn, x, visited)
+    raise ValueError("Unknown search order: %s" % order)
+
+
+@curry
+def bounded_exhaust(fn, x, order='dfs', max_states=None, timeout=None,
+                    objective=None, stats=None, visited=None):
+    """ Search like ``search`` until a budget runs out
+
+    inputs:
+        max_states -- the most expressions on which to call fn
+        timeout    -- seconds of wall-clock time, checked before each call
+        objective  -- if the budget runs out before any result is found,
+                      yield the explored expression that minimizes objective
+        stats      -- a dict, updated with the name of the limit that was
+                      hit (or None) under 'limit' and the number of
+                      expressions expanded under 'steps'
+
+    Results found before the budget runs out are yielded as they are found.
+    If there are none, the best explored expression by objective is yielded
+    instead, or the last one explored if there is no objective.
+
+    >>> from strategies.branch.search import bounded_exhaust
+    >>> def step(x):
+    ...     yield x + 1
+    ...     yield x + 2
+    >>> stats = dict()
+    >>> list(bounded_exhaust(step, 0, max_states=100, objective=lambda x: -x,
+    ...                      stats=stats))
+    [99]
+    >>> stats['limit']
+    'max_states'
+    """
+    if visited is None:
+        visited = set()
+    budget = _Budget(max_states, timeout, objective, 'max_states')
+    budget.see(x)
+    if order == 'dfs':
+        results = _dfs(fn, x, visited, budget)
+    elif order == 'bfs':
+        results = _bfs(fn, x, visited, budget)
+    else:
+        raise ValueError("Unknown search order: %s" % order)
+    found = False
+    for result in results:
+        found = True
+        yield result
+    budget.report(stats)
+    if not found:
+        yield budget.last if objective is None else budget.best
+
+
+def _dfs(fn, x, visited, budget=None):
+    visited.add(x)
+    if budget is not None:
+        fn = _bounded(fn, budget)
+    stack = [[x, iter(fn(x)), True]]  # node, successors, node is terminal
+    while stack:
+        if budget is not None and budget.limit:
+            return
+        frame = stack[-1]
+        node = frame[0]
+        for nx in frame[1]:
+            if nx is node or nx == node:
+                continue
+            frame[2] = False
+            if nx not in visited:
+                visited.add(nx)
+                stack.append([nx, iter(fn(nx)), True])
+                break
+        else:
+            stack.pop()
+            if frame[2]:
+                yield node
+
+
+def _bfs(fn, x, visited, budget=None):
+    visited.add(x)
+    if budget is not None:
+        fn = _bounded(fn, budget)
+    queue = deque([x])
+    while queue:
+        node = queue.popleft()
+        terminal = True
+        for nx in fn(node):
+            if nx is node or nx == node:
+                continue
+            terminal = False
+            if nx not in visited:
+                visited.add(nx)
+                queue.append(nx)
+        if budget is not None and budget.limit:
+            return
+        if terminal:
+            yield node
+
+
+def _bounded(fn, budget):
+    """ fn, spending a step of budget on each call
+
+    Once the budget runs out fn yields nothing further; the caller checks
+    ``budget.limit`` to stop.
+    """
+    def bounded(x):
+        if not budget.spend():
+            return ()
+        budget.see(x)
+        return fn(x)
+    return bounded
+
+
+@curry
+def best_first(fn, x, objective=identity, lower_bound=None):
+    """ Yield the best expression reachable from x on which fn has no effect
+
+    Expressions are expanded in order of ``objective``, most promising first.
+
+    Without ``lower_bound`` the first expression found on which fn has no
+    effect is yielded (greedy best-first search).  With an admissible
+    ``lower_bound`` - a function that never exceeds the objective of any
+    expression reachable from its input - expressions that cannot beat the
+    best found so far are pruned, expansion is ordered by the bound, and the
+    result minimizes the objective over the whole space.
+
+    >>> from strategies.branch.search import best_first
+    >>> def step(x):
+    ...     if x < 20:
+    ...         yield x + 3
+    ...         yield x + 5
+    >>> list(best_first(step, 0, objective=lambda x: abs(x - 21),
+    ...                 lower_bound=lambda x: 0 if x <= 21 else x - 21))
+    [21]
+    """
+    best = _best_first(x, partial(_expand, fn), objective, lower_bound,
+                       set([x]))
+    if best is not _none:
+        yield best
+
+
+@curry
+def beam(fn, x, width=10, objective=identity, lower_bound=None):
+    """ Yield the best expression found by a beam search from x
+
+    The search proceeds one rewrite at a time keeping only the ``width`` best
+    expressions by ``objective`` at each step.  Expressions on which fn has no
+    effect are candidates for the result.  An optional ``lower_bound`` prunes
+    expressions that cannot beat the best candidate found so far.
+
+    See Also:
+        best_first
+    """
+    best = _beam(x, partial(_expand, fn), objective, width, lower_bound,
+                 set([x]))
+    if best is not _none:
+        yield best
+
+
+_none = object()
+
+
+def _expand(fn, x):
+    """ Successors of x under fn, and whether x is terminal """
+    succ = [nx for nx in fn(x) if not (nx is x or nx == x)]
+    return succ, not succ
+
+
+def _best_first(start, expand, objective, lower_bound, visited=None):
+    """ Best-first search over the states reachable through expand
+
+    ``expand(state)`` returns a list of successor states and whether state is
+    terminal.  Returns the best terminal state or ``_none``.
+    """
+    priority = lower_bound or objective
+    counter = count()
+    heap = [(priority(start), next(counter), start)]
+    best, best_key = _none, None
+    while heap:
+        p, _, state = heappop(heap)
+        if best is not _none and lower_bound is not None and p >= best_key:
+            break
+        successors, terminal = expand(state)
+        if terminal:
+            key = p if lower_bound is None else objective(state)
+            if best is _none or key < best_key:
+                best, best_key = state, key
+            if lower_bound is None:
+                break
+            continue
+        for s in successors:
+            if visited is not None:
+                if s in visited:
+                    continue
+                visited.add(s)
+            p = priority(s)
+            if lower_bound is not None and best is not _none and p >= best_key:
+                continue
+            heappush(heap, (p, next(counter), s))
+    return best
+
+
+def _beam(start, expand, objective, width, lower_bound, visited=None):
+    """ Beam search over the states reachable through expand
+
+    See Also:
+        _best_first
+    """
+    level = [start]
+    best, best_key = _none, None
+    while level:
+        candidates = []
+        for state in level:
+            successors, terminal = expand(state)
+            if terminal:
+                key = objective(state)
+                if best is _none or key < best_key:
+                    best, best_key = state, key
+                continue
+            for s in successors:
+                if visited is not None:
+                    if s in visited:
+                        continue
+                    visited.add(s)
+                if (lower_bound is not None and best is not _none and
+                        lower_bound(s) >= best_key):
+                    continue
+                candidates.append(s)
+        level = nsmallest(width, candidates, key=objective)
+    return best
@@ -1,6 +1,6 @@
 from strategies.branch.core import (exhaust, debug, multiplex,
         condition, notempty, chain, onaction, sfilter, yieldify, do_one,
-        identity)
+        identity, indexed, memoized)
 
 def posdec(x):
     if x > 0:
@@ -82,6 +82,15 @@ def test_chain():
     assert set(chain([branch5, inc])(5)) == set([5, 7])
     assert list(chain([inc, branch5])(5)) == [7]
 
+def test_chain_long():
+    assert list(chain([inc] * 5000)(0)) == [5000]
+    def split(x):
+        yield x
+        yield x + 1
+    assert len(list(chain([split] * 10)(0))) == 2 ** 10
+    assert list(chain([split] * 10, unique=True)(0)) == list(range(11))
+    assert list(chain([split, lambda x: iter(())], 0)) == []
+
 def test_onaction():
     L = []
     def record(fn, input, output):
@@ -106,3 +115,37 @@ def test_do_one():
     assert list(do_one([inc])(3)) == [4]
     assert list(do_one([inc, bad])(3)) == [4]
     assert list(do_one([inc, posdec])(3)) == [4]
+    assert list(do_one([lambda x: iter(()), inc])(3)) == [4]
+    assert list(do_one([lambda x: iter(())])(3)) == []
+
+def test_indexed():
+    def bad(expr):
+        raise ValueError()
+        yield False
+    def nothing(expr):
+        return iter([])
+
+    brl = indexed(type, [(int, nothing), (int, branch5), (str, bad),
+                         (int, bad)])
+    assert set(brl(5)) == set([4, 6])
+    assert list(brl(2.0)) == []
+
+    brl = indexed(type, [(None, nothing), (None, inc)])
+    assert list(brl(1)) == [2]
+
+def test_memoized():
+    calls = []
+    def brl(x):
+        calls.append(x)
+        yield x + 1
+        yield x - 1
+    mbrl = memoized(brl, maxsize=10)
+    assert list(mbrl(1)) == [2, 0]
+    assert list(mbrl(1)) == [2, 0]
+    assert calls == [1]
+    assert mbrl.info()['hits'] == 1
+    mbrl.clear()
+    assert list(mbrl(1)) == [2, 0]
+    assert calls == [1, 1]
+    assert [type(x) for x in mbrl(1.0)] == [float, float]
+    assert list(mbrl(True)) == [2, 0] and calls == [1, 1, 1.0, True]
@@ -0,0 +1,90 @@
+from strategies.branch.traverse import (top_down, bottom_up, top_down_once,
+        bottom_up_once, sall, _product)
+from strategies.term import hashcons, Term
+from itertools import count, product
+
+
+def flip(x):
+    if x in (0, 1):
+        yield 1 - x
+        yield x
+
+def nothing(x):
+    return iter(())
+
+def unwrap(x):
+    if isinstance(x, tuple) and x[0] == 'f':
+        yield x[1]
+
+def test_product():
+    streams = [[1, 2, 3], 'ab', [True, False]]
+    result = list(_product(streams))
+    assert sorted(map(tuple, result)) == sorted(product(*streams))
+    assert result[0] == [1, 'a', True]
+    assert list(_product([[1, 2], []])) == []
+    assert list(_product([])) == [[]]
+
+def test_product_is_lazy():
+    it = _product([count(), count()])
+    first = [next(it) for i in range(10)]
+    assert len(set(map(tuple, first))) == 10
+    assert first[0] == [0, 0]
+
+def test_sall():
+    assert sorted(sall(flip, ('add', 0, 'x'))) == [('add', 0, 'x'),
+                                                   ('add', 1, 'x')]
+    assert list(sall(flip, 5)) == [5]
+    expr = ('add', 'x', 'y')
+    results = list(sall(nothing, expr))
+    assert results == [expr] and results[0] is expr
+
+def test_top_down():
+    expr = ('f', ('add', ('f', 0), 1))
+    assert sorted(top_down(flip, ('mul', 0, ('neg', 1)))) == [
+        ('mul', 0, ('neg', 0)), ('mul', 0, ('neg', 1)),
+        ('mul', 1, ('neg', 0)), ('mul', 1, ('neg', 1))]
+    assert list(top_down(unwrap, expr)) == [('add', 0, 1)]
+
+def test_bottom_up():
+    assert list(bottom_up(unwrap, ('f', ('f', ('add', ('f', 0), 1))))) == \
+            [('add', 0, 1)]
+    assert sorted(bottom_up(flip, ('add', 0, 1))) == \
+            sorted(top_down(flip, ('add', 0, 1)))
+
+def test_unique():
+    def both(x):
+        if isinstance(x, int):
+            yield 0
+            yield 0
+    assert list(top_down(both, ('add', 1, 2))) == [('add', 0, 0)]
+
+def test_limit():
+    expr = ('add',) + (0,) * 10
+    assert len(list(top_down(flip, expr, limit=5))) == 5
+    assert len(list(bottom_up(flip, expr, limit=5))) == 5
+    assert len(list(sall(flip, expr, limit=7))) == 7
+    assert len(set(top_down(flip, expr))) == 2 ** 10
+
+def test_lazy():
+    def many(x):
+        if isinstance(x, int):
+            for i in count():
+                yield i
+    it = top_down(many, ('add', 0, ('neg', 0)))
+    assert next(it) == ('add', 0, ('neg', 0))
+    assert len(set(next(it) for i in range(20))) == 20
+
+def test_once():
+    expr = ('g', ('f', 1), ('f', ('f', 2)))
+    assert list(top_down_once(unwrap, expr)) == [('g', 1, ('f', 2))]
+    assert list(top_down_once(unwrap, ('f', ('f', 1)))) == [('f', 1)]
+    assert list(bottom_up_once(unwrap, ('f', ('f', 1)))) == [('f', 1)]
+    assert list(bottom_up_once(unwrap, ('f', 1))) == [1]
+    assert list(bottom_up_once(unwrap, 'x')) == ['x']
+
+def test_terms():
+    expr = hashcons(('add', 0, ('neg', 1)))
+    results = list(top_down(flip, expr))
+    assert len(results) == 4
+    assert all(isinstance(r, Term) for r in results)
+    assert expr in results
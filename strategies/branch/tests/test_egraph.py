@@ -0,0 +1,97 @@
+from strategies.branch.egraph import EGraph, saturate
+from strategies.branch import multiplex
+from strategies.profiling import nodes
+
+
+def commute(x):
+    if isinstance(x, tuple) and x[0] in ('add', 'mul'):
+        yield (x[0], x[2], x[1])
+
+def add_zero(x):
+    if isinstance(x, tuple) and x[0] == 'add' and x[2] == 0:
+        yield x[1]
+
+def mul_one(x):
+    if isinstance(x, tuple) and x[0] == 'mul' and x[1] == 1:
+        yield x[2]
+
+rules = [commute, add_zero, mul_one]
+
+
+def test_union_and_congruence():
+    g = EGraph()
+    a, b = g.add(('f', 'x')), g.add(('f', 'y'))
+    assert g.find(a) != g.find(b)
+    g.union(g.add('x'), g.add('y'))
+    g.rebuild()
+    assert g.find(a) == g.find(b)
+
+def test_saturate():
+    expr = ('mul', ('add', 0, ('mul', 'y', 1)), 2)
+    result, = saturate(rules, expr, objective=nodes)
+    assert result in [('mul', 'y', 2), ('mul', 2, 'y')]
+    result, = saturate(rules, expr, cost=lambda op, costs: 1 + sum(costs))
+    assert nodes(result) == 3
+    result, = saturate(multiplex(rules), expr, objective=nodes)
+    assert nodes(result) == 3
+    result, = saturate(rules, expr)  # the least nodes in the whole e-graph
+    assert nodes(result) == 3
+
+def test_leaf_types():
+    g = EGraph()
+    assert len(set(g.find(g.add(x)) for x in (1, 1.0, True))) == 3
+    for expr in [('pair', True, 1), ('pair', 1.0, 1)]:
+        result, = saturate([], expr)
+        assert [type(a) for a in result] == [type(a) for a in expr]
+
+def test_cycles_terminate():
+    g = EGraph()
+    root = g.add(('add', 'x', 0))
+    g.saturate([add_zero, commute])
+    assert g.find(root) == g.find(g.add('x'))
+    # ('add', 'x', 0) passes through the class of 'x' twice
+    assert list(g.terms(root)) == ['x']
+
+def test_compact():
+    # commutativity makes 2**n orderings of a sum of n + 1 symbols
+    expr = 'x0'
+    for i in range(1, 12):
+        expr = ('add', expr, 'x%d' % i)
+    g = EGraph()
+    root = g.add(expr)
+    g.saturate([commute])
+    assert len(g) <= 3 * nodes(expr)
+
+    g = EGraph()
+    root = g.add(('add', ('add', 'x', 'y'), 'z'))
+    g.saturate([commute])
+    assert len(list(g.terms(root))) == 4
+    assert list(g.terms(root, depth=0)) == []
+
+def test_saturate_limits():
+    def grow(x):
+        if isinstance(x, int):
+            yield x + 1
+    g = EGraph()
+    g.add(0)
+    assert g.saturate([grow], iterations=3) == 3
+    g = EGraph()
+    g.add(0)
+    g.saturate([grow], iterations=100, max_nodes=10)
+    assert len(g) <= 12
+
+def test_terms_are_lazy():
+    # 2 ** 39 equivalent sums; the first few come out without listing them
+    expr = 'x0'
+    for i in range(1, 40):
+        expr = ('add', expr, 'x%d' % i)
+    g = EGraph()
+    root = g.add(expr)
+    g.saturate([commute], iterations=50)
+    it = g.terms(root)
+    first = [next(it) for i in range(10)]
+    assert len(set(first)) == 10
+    assert all(nodes(t) == nodes(expr) for t in first)
+    result, = saturate(commute, expr, objective=nodes, limit=10,
+                       iterations=50)
+    assert nodes(result) == nodes(expr)
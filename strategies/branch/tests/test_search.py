@@ -0,0 +1,111 @@
+from strategies.branch.search import search, best_first, beam, bounded_exhaust
+from strategies.branch.core import exhaust
+from strategies.cache import LRUSet, BloomFilter
+
+def branch5(x):
+    if 0 < x < 5:
+        yield x-1
+    elif 5 < x < 10:
+        yield x+1
+    elif x == 5:
+        yield x+1
+        yield x-1
+    else:
+        yield x
+
+def grid(n):
+    """ Move right or down on an n x n grid; (n, n) is the only exit """
+    def brl(pos):
+        i, j = pos
+        if i < n:
+            yield (i + 1, j)
+        if j < n:
+            yield (i, j + 1)
+    return brl
+
+def test_search():
+    for order in ('dfs', 'bfs'):
+        assert set(search(branch5, 3, order=order)) == set([0])
+        assert set(search(branch5, 5, order=order)) == set([0, 10])
+
+def test_search_bad_order():
+    try:
+        search(branch5, 3, order='sideways')
+        assert False
+    except ValueError:
+        pass
+
+def test_search_cycles():
+    def cycle(x):
+        if x == 'done':
+            return
+        yield (x + 1) % 3
+        if x == 2:
+            yield 'done'
+    for order in ('dfs', 'bfs'):
+        assert list(search(cycle, 0, order=order)) == ['done']
+    assert list(exhaust(cycle, 0)) == ['done']
+
+def test_search_expands_each_state_once():
+    calls = []
+    brl = grid(10)
+    def counted(pos):
+        calls.append(pos)
+        return brl(pos)
+    for order in ('dfs', 'bfs'):
+        del calls[:]
+        assert list(search(counted, (0, 0), order=order)) == [(10, 10)]
+        assert len(calls) == len(set(calls)) == 11 * 11
+
+def test_search_deep():
+    def down(x):
+        if x > 0:
+            yield x - 1
+    assert list(search(down, 100000)) == [0]
+    assert list(exhaust(down, 100000)) == [0]
+
+def test_search_bounded_visited():
+    brl = grid(8)
+    for visited in (LRUSet(10), BloomFilter(1000)):
+        assert list(search(brl, (0, 0), visited=visited)) == [(8, 8)]
+
+def steps(x):
+    """ Add 3 or 5 until past 20 """
+    if x < 20:
+        yield x + 3
+        yield x + 5
+
+def test_best_first():
+    objective = lambda x: abs(x - 21)
+    lower_bound = lambda x: 0 if x <= 21 else x - 21
+    assert list(best_first(steps, 0, objective=objective,
+                           lower_bound=lower_bound)) == [21]
+    # reachable terminals, for comparison
+    assert min(search(steps, 0), key=objective) == 21
+
+    # greedy without a bound: first terminal in objective order
+    assert list(best_first(steps, 0, objective=objective)) == [20]
+    assert list(best_first(branch5, 7)) == [10]
+
+def test_beam():
+    objective = lambda x: abs(x - 21)
+    assert list(beam(steps, 0, width=100, objective=objective)) == [21]
+    assert list(beam(steps, 0, width=1, objective=objective)) != []
+    assert list(beam(branch5, 5)) == [0]
+
+def test_bounded_exhaust():
+    stats = dict()
+    assert sorted(bounded_exhaust(branch5, 5, stats=stats)) == [0, 10]
+    assert stats['limit'] is None
+
+    assert list(bounded_exhaust(branch5, 5, max_states=6, stats=stats)) == [10]
+    assert stats == dict(limit='max_states', steps=6)
+    assert list(bounded_exhaust(branch5, 5, order='bfs', max_states=4,
+                                objective=lambda x: abs(x - 8))) == [7]
+
+    def forever(x):
+        yield x + 1
+    result, = bounded_exhaust(forever, 0, timeout=0.01, stats=stats)
+    assert result > 0
+    assert stats['limit'] == 'timeout'
+    assert list(bounded_exhaust(forever, 0, max_states=0)) == [0]
@@ -0,0 +1,142 @@
+""" Branching Strategies to Traverse a Tree
+
+A branching rule applied inside a tree gives each child several
+alternatives, and the node one alternative per combination of them.  These
+traversals yield the combinations lazily: each child is read only as far as
+needed and every new alternative is combined with those already read from
+the other children, so the first results come before any child is
+exhausted.
+
+A child for which the branching rule yields nothing is kept unchanged.
+Results of every node are distinct.  ``limit``, if given, caps the number of
+alternatives read from each child and yielded by each node, which bounds
+memory and time on rules with many results.
+
+>>> from strategies.branch.traverse import top_down
+>>> def flip(x):
+...     if x in (0, 1):
+...         yield 1 - x
+...         yield x
+>>> sorted(top_down(flip, ('add', 0, 1)))
+[('add', 0, 0), ('add', 0, 1), ('add', 1, 0), ('add', 1, 1)]
+>>> len(list(top_down(flip, ('add', 0, 1), limit=3)))
+3
+"""
+from itertools import islice, product
+
+from toolz import curry
+
+from ..traverse import _split, _rebuild
+from ..term import refresh
+
+_missing = object()
+
+
+@curry
+def top_down(brl, x, limit=None):
+    """ Apply a branching rule down a tree running it on the top nodes first
+    """
+    descend = sall(top_down(brl, limit=limit), limit=limit)
+    return _unique((nnx for nx in _alternatives(brl, x, limit)
+                        for nnx in descend(nx)), limit)
+
+@curry
+def bottom_up(brl, x, limit=None):
+    """ Apply a branching rule up a tree running it on the bottom nodes first
+    """
+    ascend = sall(bottom_up(brl, limit=limit), x, limit=limit)
+    return _unique((nnx for nx in ascend
+                        for nnx in _alternatives(brl, nx, limit)), limit)
+
+@curry
+def top_down_once(brl, x, limit=None):
+    """ Apply a branching rule down a tree - stop on success
+
+    Yields the results of the branching rule on x if there are any, or else
+    those of ``top_down`` on the children of x.
+    """
+    yielded = False
+    for nx in _unique(brl(x), limit):
+        yielded = True
+        yield nx
+    if not yielded:
+        for nx in sall(top_down(brl, limit=limit), x, limit=limit):
+            yield nx
+
+@curry
+def bottom_up_once(brl, x, limit=None):
+    """ Apply a branching rule up a tree - stop on success
+
+    Yields the results of ``bottom_up`` on the children of x that change x
+    if there are any, or else those of the branching rule on x.
+    """
+    yielded = False
+    for nx in sall(bottom_up(brl, limit=limit), x, limit=limit):
+        if nx is not x and nx != x:
+            yielded = True
+            yield nx
+    if not yielded:
+        for nx in _alternatives(brl, x, limit):
+            yield nx
+
+@curry
+def sall(brl, expr, limit=None):
+    """ Strategic all - apply a branching rule to args
+
+    Yields expr rebuilt with every combination of alternatives of its
+    children.
+    """
+    refresh()
+    op, children = _split(expr)
+    if not children:
+        yield expr
+        return
+    streams = [_alternatives(brl, child, limit) for child in children]
+    for new in islice(_product(streams), limit):
+        yield _rebuild(expr, op, children, new)
+
+
+def _unique(results, limit):
+    """ The distinct results, at most limit of them """
+    seen = set()
+    for nx in results:
+        if nx not in seen:
+            seen.add(nx)
+            yield nx
+            if limit is not None and len(seen) >= limit:
+                return
+
+def _alternatives(brl, x, limit):
+    """ The distinct results of brl on x, or x alone if there are none """
+    yielded = False
+    for nx in _unique(brl(x), limit):
+        yielded = True
+        yield nx
+    if not yielded:
+        yield x
+
+def _product(streams):
+    """ Lazily yield every combination of one item from each stream
+
+    Items are read from the streams in turn.  Each new item is combined with
+    the items already read from the other streams, so every combination is
+    yielded exactly once and no stream is read further than needed.
+    """
+    streams = [iter(s) for s in streams]
+    seen = []
+    for s in streams:
+        first = next(s, _missing)
+        if first is _missing:
+            return
+        seen.append([first])
+    yield [items[0] for items in seen]
+    live = list(range(len(streams)))
+    while live:
+        for i in list(live):
+            item = next(streams[i], _missing)
+            if item is _missing:
+                live.remove(i)
+                continue
+            for new in product(*(seen[:i] + [[item]] + seen[i + 1:])):
+                yield list(new)
+            seen[i].append(item)
@@ -0,0 +1,171 @@
+""" Bounded caches and sets used by memoizing and search strategies """
+from collections import OrderedDict
+from math import log
+import weakref
+
+
+class LRUCache(object):
+    """ A mapping of bounded size that evicts the least recently used entry
+
+    Keeps counts of hits, misses and evictions.
+
+    >>> from strategies.cache import LRUCache
+    >>> cache = LRUCache(2)
+    >>> cache['a'] = 1
+    >>> cache['b'] = 2
+    >>> cache.get('a')
+    1
+    >>> cache['c'] = 3  # evicts 'b', the least recently used
+    >>> 'b' in cache
+    False
+    >>> cache.hits, cache.misses, cache.evictions
+    (1, 0, 1)
+    """
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key, default=None):
+        try:
+            value = self.data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def __setitem__(self, key, value):
+        data = self.data
+        if key in data:
+            del data[key]
+        data[key] = value
+        if self.maxsize is not None and len(data) > self.maxsize:
+            data.popitem(last=False)
+            self.evictions += 1
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __len__(self):
+        return len(self.data)
+
+    def clear(self):
+        self.data.clear()
+
+    def info(self):
+        """ Counters and size as a dict """
+        return dict(hits=self.hits, misses=self.misses,
+                    evictions=self.evictions, size=len(self.data),
+                    maxsize=self.maxsize)
+
+
+class WeakLRUCache(LRUCache):
+    """ An LRUCache that holds weak references to its keys
+
+    Entries are dropped when their key is garbage collected.  Keys that
+    cannot be weakly referenced, like tuples and ints, are held strongly.
+
+    >>> from strategies.cache import WeakLRUCache
+    >>> from strategies.term import Term
+    >>> cache = WeakLRUCache()
+    >>> cache[Term('f', [1])] = 1
+    >>> len(cache)  # the term was only referenced by the cache
+    0
+    """
+    def __init__(self, maxsize=1024):
+        super(WeakLRUCache, self).__init__(maxsize)
+        data = self.data
+
+        def remove(ref):
+            data.pop(ref, None)
+        self._remove = remove
+
+    def _ref(self, key, callback=None):
+        try:
+            return weakref.ref(key, callback)
+        except TypeError:
+            return key
+
+    def get(self, key, default=None):
+        return super(WeakLRUCache, self).get(self._ref(key), default)
+
+    def __setitem__(self, key, value):
+        super(WeakLRUCache, self).__setitem__(self._ref(key, self._remove),
+                                              value)
+
+    def __contains__(self, key):
+        return self._ref(key) in self.data
+
+
+class LRUSet(object):
+    """ A set of bounded size that forgets the least recently used element
+
+    >>> from strategies.cache import LRUSet
+    >>> s = LRUSet(2)
+    >>> s.add(1); s.add(2); s.add(3)
+    >>> 1 in s, 3 in s
+    (False, True)
+    """
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+
+    def add(self, key):
+        data = self.data
+        if key in data:
+            del data[key]
+        data[key] = None
+        if len(data) > self.maxsize:
+            data.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __len__(self):
+        return len(self.data)
+
+
+class BloomFilter(object):
+    """ A probabilistic set of fixed memory
+
+    Membership tests may return false positives, at roughly ``error_rate``
+    once ``capacity`` elements have been added, but never false negatives.
+    Elements cannot be listed or removed.
+
+    >>> from strategies.cache import BloomFilter
+    >>> b = BloomFilter(1000)
+    >>> b.add(('add', 1, 2))
+    >>> ('add', 1, 2) in b
+    True
+    """
+    def __init__(self, capacity=1000000, error_rate=0.01):
+        nbits = int(-capacity * log(error_rate) / log(2) ** 2) + 1
+        self.nbits = nbits
+        self.nhashes = max(1, int(round(nbits / float(capacity) * log(2))))
+        self.bits = bytearray(nbits // 8 + 1)
+
+    def _positions(self, key):
+        h = hash(key) & _MASK64
+        # splitmix64 finalizer so that small integer hashes spread out
+        h = ((h ^ (h >> 30)) * 0xbf58476d1ce4e5b9) & _MASK64
+        h = ((h ^ (h >> 27)) * 0x94d049bb133111eb) & _MASK64
+        h ^= h >> 31
+        h1, h2 = h & 0xffffffff, (h >> 32) | 1
+        return [(h1 + i * h2) % self.nbits for i in range(self.nhashes)]
+
+    def add(self, key):
+        bits = self.bits
+        for p in self._positions(key):
+            bits[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, key):
+        bits = self.bits
+        for p in self._positions(key):
+            if not bits[p >> 3] & (1 << (p & 7)):
+                return False
+        return True
+
+
+_MASK64 = 0xffffffffffffffff
@@ -1,16 +1,174 @@
 """ Generic SymPy-Independent Strategies """
+from threading import Lock
+from timeit import default_timer
 from toolz import curry, memoize, identity
+from .cache import LRUCache, WeakLRUCache
+from .term import Term, hashcons
 
 
 @curry
 def exhaust(fn, x):
     """ Apply a fn repeatedly until it has no effect """
     new, old = fn(x), x
-    while(new != old):
+    while(new is not old and new != old):
         new, old = fn(new), new
     return new
 
 
+@curry
+def cycle_exhaust(fn, x, objective=identity, window=64):
+    """ Apply a fn repeatedly until it has no effect or it cycles
+
+    ``exhaust`` only notices a fixpoint, so rules that undo each other, such
+    as commutativity applied twice, make it run forever.  Here the hashes of
+    the last ``window`` results are remembered, which finds short cycles as
+    soon as they close, and Brent's algorithm finds cycles of any length
+    after at most a few trips around them.  Equal hashes are confirmed by
+    comparing the expressions.
+
+    On a cycle the member that minimizes ``objective`` is returned, so the
+    result does not depend on where the cycle was entered.  By default
+    members are compared themselves, as in ``minimize``; if they cannot be
+    ordered, e.g. tuples with mixed leaves or ``Term``s, they are compared by
+    ``repr`` instead.
+
+    >>> from strategies.core import cycle_exhaust
+    >>> flip = lambda x: (x[0], x[2], x[1]) if x[0] == 'add' else x
+    >>> cycle_exhaust(flip, ('add', 'y', 'x'))
+    ('add', 'x', 'y')
+    >>> cycle_exhaust(lambda x: (x + 1) % 1000, 999)
+    0
+    """
+    recent = LRUCache(window)
+    saved, saved_hash = x, _hash(x)
+    power, steps = 1, 0
+    old = x
+    while True:
+        new = fn(old)
+        if new is old or new == old:
+            return new
+        h = _hash(new)
+        if h is not None:
+            prev = recent.get(h, _missing)
+            if prev is not _missing and (prev is new or prev == new):
+                return _cycle_min(fn, new, objective)
+            recent[h] = new
+        if h == saved_hash and (saved is new or saved == new):
+            return _cycle_min(fn, new, objective)
+        steps += 1
+        if steps == power:
+            saved, saved_hash = new, h
+            power, steps = 2 * power, 0
+        old = new
+
+
+def _hash(x):
+    try:
+        return hash(x)
+    except TypeError:
+        return None
+
+
+def _cycle_min(fn, start, objective):
+    """ The member of the cycle through start that minimizes objective
+
+    Falls back to ``repr`` if the members themselves cannot be compared.
+    """
+    try:
+        return _cycle_min_key(fn, start, objective)
+    except TypeError:
+        if objective is not identity:
+            raise
+        return _cycle_min_key(fn, start, repr)
+
+
+def _cycle_min_key(fn, start, objective):
+    best, best_key = start, objective(start)
+    x = fn(start)
+    while not (x is start or x == start):
+        key = objective(x)
+        if key < best_key:
+            best, best_key = x, key
+        x = fn(x)
+    return best
+
+
+@curry
+def bounded_exhaust(fn, x, max_steps=None, timeout=None, objective=None,
+                    stats=None):
+    """ Apply a fn repeatedly until it has no effect or a budget runs out
+
+    inputs:
+        max_steps -- the most applications of fn
+        timeout   -- seconds of wall-clock time, checked before each step
+        objective -- if the budget runs out, return the expression seen so
+                     far that minimizes objective rather than the last one
+        stats     -- a dict, updated with the name of the limit that was hit
+                     (or None) under 'limit' and the number of steps taken
+
+    >>> from strategies.core import bounded_exhaust
+    >>> stats = dict()
+    >>> bounded_exhaust(lambda x: x - 1 if x > 0 else x, 100, max_steps=10,
+    ...                 stats=stats)
+    90
+    >>> stats['limit'], stats['steps']
+    ('max_steps', 10)
+    """
+    budget = _Budget(max_steps, timeout, objective)
+    old = x
+    budget.see(x)
+    while budget.spend():
+        new = fn(old)
+        if new is old or new == old:
+            budget.report(stats)
+            return new
+        budget.see(new)
+        old = new
+    budget.report(stats)
+    return budget.last if objective is None else budget.best
+
+
+class _Budget(object):
+    """ Count steps against a maximum and a deadline
+
+    Also tracks the last state seen and the best by an objective, if one is
+    given.  ``name`` is the limit reported when max_steps is reached.
+    """
+    def __init__(self, max_steps=None, deadline=None, objective=None,
+                 name='max_steps', timer=default_timer):
+        self.max_steps = max_steps
+        self.name = name
+        self.timer = timer
+        self.deadline = None if deadline is None else timer() + deadline
+        self.objective = objective
+        self.steps = 0
+        self.limit = None
+        self.best = self.best_key = self.last = _missing
+
+    def spend(self):
+        """ Take a step.  False if the budget has run out """
+        if self.max_steps is not None and self.steps >= self.max_steps:
+            self.limit = self.name
+            return False
+        if self.deadline is not None and self.timer() >= self.deadline:
+            self.limit = 'timeout'
+            return False
+        self.steps += 1
+        return True
+
+    def see(self, state):
+        self.last = state
+        if self.objective is not None:
+            key = self.objective(state)
+            if self.best is _missing or key < self.best_key:
+                self.best, self.best_key = state, key
+
+    def report(self, stats):
+        if stats is not None:
+            stats['limit'] = self.limit
+            stats['steps'] = self.steps
+
+
 @curry
 def condition(cond, fn, x):
     """ Only apply fn if condition is true """
@@ -31,33 +189,100 @@ def chain(fns, x):
 @curry
 def onaction(fn, action, x):
     result = fn(x)
-    if result != x:
+    if result is not x and result != x:
         action(fn, x, result)
     return result
 
 
 def debug(fn, file=None):
     """ Print input and output each time function has an effect """
+    return onaction(fn, _write(file))
+
+
+@curry
+def _write(file, fn, x, result):
+    # stdout is looked up on each call so that debug(fn) can be pickled
     if not file:
         from sys import stdout
         file = stdout
+    file.write("Fn:  %s\n"%fn.__name__)
+    file.write("In:  %s\nOut: %s\n\n"%(x, result))
 
-    def write(fn, x, result):
-        file.write("Fn:  %s\n"%fn.__name__)
-        file.write("In:  %s\nOut: %s\n\n"%(x, result))
 
-    return onaction(fn, write)
+@curry
+def null_safe(rule, expr):
+    """ Return original expr if rule returns None """
+    result = rule(expr)
+    if result is None:
+        return expr
+    else:
+        return result
+
 
+def memoized(rule, maxsize=1024, weak=False):
+    """ Cache the results of a rule, evicting the least recently used
 
-def null_safe(rule):
-    """ Return original expr if rule returns None """
-    def null_safe_rl(expr):
-        result = rule(expr)
-        if result is None:
-            return expr
-        else:
-            return result
-    return null_safe_rl
+    inputs:
+        rule    -- a rule, assumed to be pure
+        maxsize -- the number of results to keep, or None for no bound
+        weak    -- hold ``Term`` inputs by weak reference so that they can
+                   still be garbage collected.  Only Terms and leaves are
+                   cached; tuple trees have no object that lives as long as
+                   they do to reference weakly, so they are passed straight
+                   to the rule.  Hash-cons them to cache them.
+
+    The returned rule has ``clear()`` to empty the cache and ``info()`` for
+    its hit, miss and eviction counts.  Unhashable inputs are passed straight
+    to the rule.  Inputs that are equal but of different types, e.g. ``1``,
+    ``1.0`` and ``True`` or ``('f', 1)`` and ``('f', 1.0)``, are cached apart.
+
+    >>> from strategies.core import memoized
+    >>> from strategies.examples import inc
+    >>> rl = memoized(inc, maxsize=2)
+    >>> rl(1), rl(1), rl(2)
+    (2, 2, 3)
+    >>> info = rl.info()
+    >>> info['hits'], info['misses']
+    (1, 2)
+    """
+    cache = WeakLRUCache(maxsize) if weak else LRUCache(maxsize)
+
+    def memoized_rl(x):
+        try:
+            key = _memo_key(x, weak)
+            result = cache.get(key, _missing)
+        except TypeError:  # unhashable, or a tuple tree in a weak cache
+            return rule(x)
+        if result is _missing:
+            result = rule(x)
+            cache[key] = result
+        return result
+    memoized_rl.__name__ = getattr(rule, '__name__', 'memoized_rl')
+    memoized_rl.cache = cache
+    memoized_rl.clear = cache.clear
+    memoized_rl.info = cache.info
+    return memoized_rl
+
+
+_missing = object()
+
+
+def _memo_key(x, weak=False):
+    """ A cache key for x that tells apart equal values of different types
+
+    ``Term``s are keyed on themselves, as they are equal only when identical.
+    Other values are keyed with their type, and tuple trees are hash-consed
+    first, which keys each of their leaves with its type too.  A weak cache
+    would hold that key strongly, and the Term in it, so tuple trees raise
+    TypeError when ``weak``.
+    """
+    if type(x) is Term:
+        return x
+    if type(x) is tuple and x:
+        if weak:
+            raise TypeError("tuple trees are not cached weakly")
+        return (tuple, hashcons(x))
+    return (type(x), x)
 
 
 @curry
@@ -65,7 +290,7 @@ def do_one(fns, x):
     """ Try each of the functions until one works. Then stop. """
     for fn in fns:
         result = fn(x)
-        if result != x:
+        if result is not x and result != x:
             return result
     return x
 
@@ -77,6 +302,58 @@ def switch(key, fndict, x):
     return fn(x)
 
 
+def _index(key_rules):
+    """ Group (key, rule) pairs by key, keeping their order
+
+    Rules with key None apply to every key.  Returns a dict mapping each key
+    to its rules and the list of rules for keys not in that dict.
+    """
+    key_rules = list(key_rules)
+    default = [rl for k, rl in key_rules if k is None]
+    table = dict()
+    for k, _ in key_rules:
+        if k is not None and k not in table:
+            table[k] = [rl for k2, rl in key_rules if k2 is None or k2 == k]
+    return table, default
+
+
+def indexed(key, rules):
+    """ Try only those rules indexed under key(x).  Stop on first success
+
+    inputs:
+        key   -- a function from expression to index key, e.g. term.head
+        rules -- a sequence of (k, rule) pairs.  A rule is tried on x only if
+                 k == key(x) or if k is None.
+
+    Has the semantics of ``do_one`` over the selected rules, which are tried in
+    their original order.
+
+    >>> from strategies.core import indexed
+    >>> from strategies.term import head
+    >>> rl = indexed(head, [('neg', lambda x: ('pos', x[1])),
+    ...                     (int, lambda x: x + 1)])
+    >>> rl(('neg', 1))
+    ('pos', 1)
+    >>> rl(1)
+    2
+    """
+    table, default = _index(rules)
+    return _indexed(key, table, default)
+
+
+@curry
+def _indexed(key, table, default, x):
+    try:
+        fns = table.get(key(x), default)
+    except TypeError:  # unhashable key
+        fns = default
+    for fn in fns:
+        result = fn(x)
+        if result is not x and result != x:
+            return result
+    return x
+
+
 @curry
 def typed(fntypes, x):
     """ Apply fns based on the input type
@@ -107,6 +384,37 @@ def minimize(fns, x, **kwargs):
     >>> fn = minimize([inc, dec], objective=lambda x: -x)  # maximize
     >>> fn(4)
     5
+
+    ``cache=n`` keeps the objective of the last ``n`` distinct results, so
+    that an expensive objective is computed once per result across calls
+    with that objective; results must be hashable.
+
+    See Also:
+        strategies.core.memoized
     """
-    objective = kwargs.get('objective', identity)
+    objective = _cached_objective(kwargs.get('objective', identity),
+                                  kwargs.get('cache'))
     return min([fn(x) for fn in fns], key=objective)
+
+
+def _cached_objective(objective, cache):
+    """ objective memoized with room for cache results, shared across calls
+
+    The memoized objectives of the most recently used objectives are kept so
+    that a curried ``minimize`` finds its cache again on each call.
+    """
+    if not cache:
+        return objective
+    key = (objective, cache)
+    with _objectives_lock:
+        try:
+            result = _objectives.get(key)
+        except TypeError:  # unhashable objective
+            return memoized(objective, maxsize=cache)
+        if result is None:
+            result = _objectives[key] = memoized(objective, maxsize=cache)
+    return result
+
+
+_objectives = LRUCache(64)
+_objectives_lock = Lock()
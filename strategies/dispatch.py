@@ -1,6 +1,34 @@
-from multipledispatch import dispatch
+from multipledispatch import dispatch, Dispatcher as _Dispatcher
 from functools import partial
 
 namespace = dict()
 
 dispatch = partial(dispatch, namespace=namespace)
+
+
+class Dispatcher(_Dispatcher):
+    """ A dispatcher that counts changes to its implementations
+
+    ``version`` grows on every registration, including one that replaces an
+    existing signature, so callers that cache resolved implementations can
+    tell when to forget them.
+    """
+    __slots__ = ('version',)
+
+    def __init__(self, name, doc=None):
+        _Dispatcher.__init__(self, name, doc)
+        self.version = 0
+
+    def add(self, signature, func):
+        _Dispatcher.add(self, signature, func)
+        self.version += 1
+
+    def remove(self, signature):
+        """ Forget the implementation registered for signature """
+        del self.funcs[tuple(signature)]
+        self._cache.clear()
+        try:
+            del self._ordering
+        except AttributeError:
+            pass
+        self.version += 1
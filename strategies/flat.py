@@ -0,0 +1,220 @@
+""" A compact array-backed store for large trees
+
+A ``FlatTree`` holds a tree as parallel arrays in postorder - children before
+their parent, the root last - rather than as nested tuples:
+
+    op     -- operator code of each node, an index into ``symbols``, or -1
+    arity  -- number of children of each node
+    start  -- index of the first node of each node's subtree
+    value  -- index into ``values`` for leaves, -1 for other nodes
+
+The subtree of node ``i`` occupies ``start[i]`` through ``i``.  Arrays are
+``array.array`` buffers of machine integers; where NumPy is installed scans
+over them are vectorized.
+
+>>> from strategies.flat import flatten
+>>> t = flatten(('add', 1, ('mul', 2, 'x')))
+>>> len(t)
+5
+>>> t.to_tuple()
+('add', 1, ('mul', 2, 'x'))
+>>> list(t.select(['mul']))
+[3]
+"""
+from array import array
+
+from .term import protocol, refresh
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+class FlatTree(object):
+    """ A tree stored as postorder arrays
+
+    See the module docstring for the layout.  Build one with ``flatten``.
+    """
+    __slots__ = ('op', 'arity', 'start', 'value', 'symbols', 'values')
+
+    def __init__(self, op, arity, start, value, symbols, values):
+        self.op, self.arity, self.start, self.value = op, arity, start, value
+        self.symbols, self.values = symbols, values
+
+    def __len__(self):
+        return len(self.op)
+
+    def __repr__(self):
+        return 'FlatTree(<%d nodes>)' % len(self)
+
+    def children(self, i):
+        """ Indices of the children of node i, in order """
+        result = []
+        j = i - 1
+        for _ in range(self.arity[i]):
+            result.append(j)
+            j = self.start[j] - 1
+        result.reverse()
+        return result
+
+    def to_tuple(self, i=None):
+        """ The subtree at node i, by default the root, as nested tuples """
+        if i is None:
+            i = len(self) - 1
+        return _build(self, self.start[i], i + 1)
+
+    def codes(self, heads):
+        """ Operator codes of heads, skipping those absent from this tree """
+        index = dict((op, code) for code, op in enumerate(self.symbols))
+        return [index[h] for h in heads if h in index]
+
+    def select(self, heads):
+        """ Indices of the nodes whose operator is one of heads, in postorder
+        """
+        return _nonzero(_isin(self.op, self.codes(heads)))
+
+
+def flatten(expr):
+    """ Convert a tree in the term protocol into a ``FlatTree``
+
+    Runs without recursion, so trees of any depth can be converted.
+    """
+    refresh()
+    op, arity, start, value = array('i'), array('i'), array('q'), array('q')
+    symbols, values, codes = [], [], dict()
+    # bound methods are hoisted out of the loop, which runs once per node
+    add_op, add_arity, add_start, add_value = (op.append, arity.append,
+                                               start.append, value.append)
+    stack, closing = [expr], []
+    n = 0  # nodes added so far
+    while stack:
+        node = stack.pop()
+        if node is _close:
+            code, k, first = closing.pop()
+            add_op(code)
+            add_arity(k)
+            add_start(first)
+            add_value(-1)
+            n += 1
+            continue
+        p = protocol(type(node))
+        if p is not None:
+            try:
+                head, args = p[0](node), p[1](node)
+            except NotImplementedError:  # this instance is a leaf
+                p = None
+        if p is None:
+            add_op(-1)
+            add_arity(0)
+            add_start(n)
+            add_value(len(values))
+            values.append(node)
+            n += 1
+            continue
+        code = codes.get(head)
+        if code is None:
+            code = codes[head] = len(symbols)
+            symbols.append(head)
+        closing.append((code, len(args), n))
+        stack.append(_close)
+        stack.extend(reversed(args))
+    return FlatTree(op, arity, start, value, symbols, values)
+
+
+_close = object()  # marks where the children of a node end in flatten
+
+
+def unflatten(tree):
+    """ Convert a ``FlatTree`` into nested tuples """
+    return tree.to_tuple()
+
+
+def bottom_up(rule, tree, heads=None):
+    """ Apply a rule up a flat tree running it on the bottom nodes first
+
+    Returns a new ``FlatTree``.  If ``heads`` is given the rule is only
+    called on nodes with one of those operators.  The nodes to visit are then
+    found by vectorized scans and subtrees that contain no such node are
+    copied unchanged.
+
+    >>> from strategies.flat import flatten, bottom_up
+    >>> def rl(x):
+    ...     return x[1] if x[0] == 'neg' and x[1][0] == 'neg' else x
+    >>> t = flatten(('add', 1, ('neg', ('neg', 'x'))))
+    >>> bottom_up(rl, t, heads=['neg']).to_tuple()
+    ('add', 1, ('neg', 'x'))
+    """
+    if heads is None:
+        return flatten(_build(tree, 0, len(tree), rule))
+    codes = tree.codes(heads)
+    if not codes:
+        return tree
+    hit = _isin(tree.op, codes)
+    live = _nonzero(_contains(tree, hit))
+    if len(live) * 4 > len(tree):
+        return flatten(_build(tree, 0, len(tree), rule, hit))
+    # few nodes to visit: rebuild only those, copying the rest as tuples
+    out = dict()
+    for i in live:
+        args = [out[c] if c in out else tree.to_tuple(c)
+                for c in tree.children(i)]
+        node = (tree.symbols[tree.op[i]],) + tuple(args)
+        out[i] = rule(node) if hit[i] else node
+    return flatten(out[len(tree) - 1])
+
+
+def _build(tree, lo, hi, rule=None, mask=None):
+    """ Rebuild the nodes lo through hi - 1, a whole subtree, as tuples
+
+    If given, rule is applied to each node, or only to those in mask.
+    """
+    op, arity, value = tree.op, tree.arity, tree.value
+    symbols, values = tree.symbols, tree.values
+    stack = []
+    for i in range(lo, hi):
+        if op[i] < 0:
+            node = values[value[i]]
+        else:
+            n = arity[i]
+            args = stack[len(stack) - n:]
+            del stack[len(stack) - n:]
+            node = (symbols[op[i]],) + tuple(args)
+        if rule is not None and (mask is None or mask[i]):
+            node = rule(node)
+        stack.append(node)
+    return stack[-1]
+
+
+def _isin(codes, selected):
+    """ A mask of the positions of codes that hold one of selected """
+    if numpy is not None:
+        return numpy.isin(numpy.frombuffer(codes, dtype=numpy.intc),
+                          selected)
+    selected = set(selected)
+    return array('b', [c in selected for c in codes])
+
+
+def _nonzero(mask):
+    """ Positions of the true entries of a mask """
+    if numpy is not None:
+        return numpy.flatnonzero(mask).tolist()
+    return [i for i, m in enumerate(mask) if m]
+
+
+def _contains(tree, mask):
+    """ A mask of the nodes whose subtree contains a node in mask
+
+    Subtrees are contiguous in postorder so this is a difference of prefix
+    sums.
+    """
+    if numpy is not None:
+        sums = numpy.concatenate([[0], numpy.cumsum(mask)])
+        start = numpy.frombuffer(tree.start, dtype=numpy.int64)
+        return sums[1:] - sums[start] > 0
+    sums = [0]
+    total = 0
+    for m in mask:
+        total += m
+        sums.append(total)
+    return [sums[i + 1] - sums[s] > 0 for i, s in enumerate(tree.start)]
@@ -0,0 +1,229 @@
+""" Apply strategies across processes and threads """
+import atexit
+import threading
+from collections import deque
+from itertools import islice
+
+from toolz import curry, identity
+
+from .branch.core import multiplex
+
+
+def batch(strategy, exprs, processes=None, chunksize=100, pending=None):
+    """ Apply a strategy to each expression, in parallel
+
+    inputs:
+        strategy  -- a rule to apply to each expression.  It is pickled once
+                     per worker process; see ``Rebuild`` for strategies that
+                     cannot be pickled.
+        exprs     -- an iterable of expressions, possibly long or unbounded
+        processes -- the number of worker processes, by default one per CPU.
+                     With ``processes=1`` everything runs in this process.
+        chunksize -- the number of expressions sent to a worker at a time
+        pending   -- the most chunks in flight at once, by default four per
+                     process.  Bounds memory use when exprs is much larger
+                     than the consumer can keep up with.
+
+    Results are yielded lazily, in the order of their expressions.  The pool
+    is shut down when the iterator is exhausted or closed.
+
+    >>> from strategies.parallel import batch
+    >>> from strategies.traverse import bottom_up
+    >>> list(batch(bottom_up(abs), [-1, -2, -3], processes=1))
+    [1, 2, 3]
+    """
+    if processes == 1:
+        for expr in exprs:
+            yield strategy(expr)
+        return
+
+    from multiprocessing import Pool, cpu_count
+    processes = processes or cpu_count()
+    pending = pending or 4 * processes
+    pool = Pool(processes, initializer=_init, initargs=(strategy,))
+    try:
+        queue = deque()
+        for chunk in _chunks(exprs, chunksize):
+            queue.append(pool.apply_async(_apply, (chunk,)))
+            if len(queue) >= pending:
+                for result in queue.popleft().get():
+                    yield result
+        while queue:
+            for result in queue.popleft().get():
+                yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+@curry
+def pminimize(fns, x, **kwargs):
+    """ Select result of functions that minimizes objective, in parallel
+
+    Like ``strategies.core.minimize`` but every function, and the objective
+    of its result, is evaluated concurrently.
+
+    keyword inputs:
+        objective   -- the function to minimize, by default the identity
+        executor    -- 'thread' (default), 'process' or a
+                       ``concurrent.futures.Executor`` to run on
+        max_workers -- the size of the pool when executor is a string
+        cutoff      -- evaluate serially when there are fewer than this many
+                       functions (default 2)
+
+    Ties go to the earliest function, as with ``minimize``, whichever order
+    the evaluations finish in.
+
+    Pools are shared between calls.  A call made from inside one of their
+    workers, e.g. by a function that is itself a ``pminimize``, runs
+    serially rather than wait on the pool it occupies.  ``shutdown`` stops
+    the pools.
+
+    >>> from strategies.parallel import pminimize
+    >>> from strategies.examples import inc, dec
+    >>> pminimize([inc, dec])(4)
+    3
+    >>> pminimize([inc, dec], objective=lambda x: -x)(4)
+    5
+    """
+    objective = kwargs.get('objective', identity)
+    if len(fns) < kwargs.get('cutoff', 2) or _inside():
+        return min([fn(x) for fn in fns], key=objective)
+    pool = _executor(kwargs.get('executor', 'thread'),
+                     kwargs.get('max_workers'))
+    futures = [pool.submit(_work, _score, fn, objective, x) for fn in fns]
+    # min keeps the first of equal scores, so results do not depend on timing
+    return min([f.result() for f in futures], key=_first)[1]
+
+
+@curry
+def pmultiplex(fns, x, **kwargs):
+    """ Multiplex many branching rules into one, running them in parallel
+
+    Like ``strategies.branch.multiplex`` but each branching rule is run to
+    completion concurrently.  Results are yielded in the same order as
+    ``multiplex``: all those of the first rule, then the new ones of the
+    second, and so on, each as soon as its rule and those before it finish.
+
+    Takes the keyword inputs ``executor``, ``max_workers`` and ``cutoff`` of
+    ``pminimize``.  When run serially, as ``pminimize`` may be, it is
+    ``multiplex`` itself and so as lazy.
+    """
+    if len(fns) < kwargs.get('cutoff', 2) or _inside():
+        for nx in multiplex(fns, x):
+            yield nx
+        return
+    pool = _executor(kwargs.get('executor', 'thread'),
+                     kwargs.get('max_workers'))
+    futures = [pool.submit(_work, _drain, brl, x) for brl in fns]
+    results = (f.result() for f in futures)
+    seen = set()
+    for nxs in results:
+        for nx in nxs:
+            if nx not in seen:
+                seen.add(nx)
+                yield nx
+
+
+class Rebuild(object):
+    """ A strategy that is rebuilt from a factory wherever it is unpickled
+
+    Many strategies hold closures, compiled code or caches that cannot be
+    pickled, e.g. ``compile_tree``, ``memoized`` or a ``Profiler``.  Wrap a
+    picklable factory that builds the strategy instead; the strategy is
+    built on first use, once per process.
+
+    >>> from strategies.parallel import Rebuild
+    >>> from strategies.tree import compile_tree
+    >>> from strategies.examples import inc, dec
+    >>> rl = Rebuild(compile_tree, ([inc, dec], inc))
+    >>> rl(3)
+    3
+    """
+    def __init__(self, factory, *args, **kwargs):
+        self.factory, self.args, self.kwargs = factory, args, kwargs
+        self.strategy = None
+
+    def __call__(self, expr):
+        if self.strategy is None:
+            self.strategy = self.factory(*self.args, **self.kwargs)
+        return self.strategy(expr)
+
+    def __getstate__(self):
+        return (self.factory, self.args, self.kwargs)
+
+    def __setstate__(self, state):
+        self.factory, self.args, self.kwargs = state
+        self.strategy = None
+
+
+_executors = dict()
+
+def _executor(executor, max_workers):
+    """ An executor, shared between calls with the same kind and size """
+    if not isinstance(executor, str):
+        return executor
+    key = (executor, max_workers)
+    if key not in _executors:
+        from concurrent import futures
+        if executor == 'thread':
+            _executors[key] = futures.ThreadPoolExecutor(max_workers)
+        elif executor == 'process':
+            _executors[key] = futures.ProcessPoolExecutor(max_workers)
+        else:
+            raise ValueError("Unknown executor %r, expected 'thread' or "
+                             "'process'" % (executor,))
+    return _executors[key]
+
+def shutdown(wait=True):
+    """ Shut down the pools shared by ``pminimize`` and ``pmultiplex``
+
+    Later calls start new pools.  Runs at interpreter exit.
+    """
+    while _executors:
+        _, pool = _executors.popitem()
+        pool.shutdown(wait)
+
+atexit.register(shutdown)
+
+_local = threading.local()
+
+def _inside():
+    """ Whether this thread is running work for a pool of this module """
+    return getattr(_local, 'inside', False)
+
+def _work(fn, *args):
+    _local.inside = True
+    try:
+        return fn(*args)
+    finally:
+        _local.inside = False
+
+def _score(fn, objective, x):
+    result = fn(x)
+    return objective(result), result
+
+def _first(pair):
+    return pair[0]
+
+def _drain(brl, x):
+    return list(brl(x))
+
+_strategy = None
+
+def _init(strategy):
+    global _strategy
+    _strategy = strategy
+
+def _apply(chunk):
+    strategy = _strategy
+    return [strategy(expr) for expr in chunk]
+
+def _chunks(seq, n):
+    it = iter(seq)
+    while True:
+        chunk = list(islice(it, n))
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,213 @@
+""" Declarative rewrite rules compiled into one matching automaton
+
+A rule is a pair ``(pattern, replacement)`` of terms containing variables.
+A ``RuleSet`` compiles many rules into a single discrimination tree - a trie
+over the operators, arities and constants of each pattern in preorder, in
+which a variable matches any subterm - so every pattern is tested in one
+pass over a node and rules sharing a prefix share the work of matching it.
+
+>>> from strategies.rewrite import Var, RuleSet
+>>> x, y = Var('x'), Var('y')
+>>> rules = RuleSet([(('add', x, 0), x),
+...                  (('mul', x, 1), x),
+...                  (('sub', x, x), 0)])
+>>> rules(('add', 'a', 0))
+'a'
+>>> rules(('sub', 'a', 'a')), rules(('sub', 'a', 'b'))
+(0, ('sub', 'a', 'b'))
+
+A ``RuleSet`` is a rule, so it works with every strategy
+
+>>> from strategies.traverse import bottom_up
+>>> bottom_up(rules)(('mul', ('add', 'a', 0), 1))
+'a'
+"""
+from .term import split, rebuild, refresh, args_like
+
+
+class Var(object):
+    """ A pattern variable
+
+    Matches any subterm.  A variable that occurs more than once in a pattern
+    matches only equal subterms.
+    """
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __eq__(self, other):
+        return type(other) is Var and self.name == other.name
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((Var, self.name))
+
+    def __repr__(self):
+        return 'Var(%r)' % (self.name,)
+
+
+class RuleSet(object):
+    """ Many rewrite rules matched together
+
+    inputs:
+        rules -- a sequence of ``(pattern, replacement)`` or ``(pattern,
+                 replacement, condition)`` triples.  A replacement is a term
+                 containing variables of its pattern or a function called
+                 with the bindings as keyword arguments.  The optional
+                 condition is likewise called with the bindings and the rule
+                 applies only if it returns true.
+
+    Calling a ``RuleSet`` applies the first rule, in the given order, that
+    matches; it has the semantics of ``do_one`` over the rules.  ``branch``
+    is a branching rule yielding the result of every rule that matches.
+    """
+    def __init__(self, rules):
+        self.rules = []
+        self.root = _State()
+        for i, rule in enumerate(rules):
+            pattern, replacement = rule[0], rule[1]
+            condition = rule[2] if len(rule) > 2 else None
+            self.rules.append((pattern, replacement, condition))
+            state, names = self.root, []
+            for key in _tokens(pattern):
+                if isinstance(key, Var):
+                    names.append(key.name)
+                    state = state.var if state.var is not None else \
+                        state.add_var()
+                else:
+                    state = state.edges[key] if key in state.edges else \
+                        state.add(key)
+            state.accept.append((i, names))
+
+    def matches(self, expr):
+        """ Yield ``(index, bindings)`` for every rule matching expr
+
+        Rules are yielded in their given order.
+        """
+        refresh()
+        found = []
+        stack = [(self.root, (expr, None), ())]
+        while stack:
+            state, todo, bound = stack.pop()
+            if todo is None:
+                for i, names in state.accept:
+                    bindings = _bind(names, bound)
+                    if bindings is not None:
+                        found.append((i, bindings))
+                continue
+            term, rest = todo
+            if state.var is not None:
+                stack.append((state.var, rest, bound + (term,)))
+            op, args = split(term)
+            key = term if args is None else (_NODE, op, len(args))
+            try:
+                nxt = state.edges.get(key)
+            except TypeError:  # an unhashable leaf
+                nxt = None
+            if nxt is not None:
+                if args:
+                    for a in reversed(args):
+                        rest = (a, rest)
+                stack.append((nxt, rest, bound))
+        found.sort(key=lambda m: m[0])
+        for i, bindings in found:
+            condition = self.rules[i][2]
+            if condition is None or condition(**bindings):
+                yield i, bindings
+
+    def _apply(self, i, bindings, expr):
+        replacement = self.rules[i][1]
+        if callable(replacement):
+            return replacement(**bindings)
+        return _substitute(replacement, bindings, _like(expr, replacement))
+
+    def __call__(self, expr):
+        for i, bindings in self.matches(expr):
+            result = self._apply(i, bindings, expr)
+            if result is not expr and result != expr:
+                return result
+        return expr
+
+    def branch(self, expr):
+        """ Yield the result of every rule that matches expr """
+        for i, bindings in self.matches(expr):
+            yield self._apply(i, bindings, expr)
+
+    def __len__(self):
+        return len(self.rules)
+
+
+class _State(object):
+    """ A state of the discrimination tree """
+    __slots__ = ('edges', 'var', 'accept')
+
+    def __init__(self):
+        self.edges = dict()
+        self.var = None
+        self.accept = []  # (rule index, variable names in preorder)
+
+    def add(self, key):
+        state = self.edges[key] = _State()
+        return state
+
+    def add_var(self):
+        state = self.var = _State()
+        return state
+
+
+_NODE = object()  # tags the keys of operators so they equal no leaf
+
+
+def _tokens(pattern):
+    """ Keys of the pattern in preorder, with variables as themselves """
+    stack = [pattern]
+    while stack:
+        x = stack.pop()
+        if isinstance(x, Var):
+            yield x
+            continue
+        op, args = split(x)
+        if args is None:
+            yield x
+            continue
+        yield (_NODE, op, len(args))
+        stack.extend(reversed(args))
+
+
+def _bind(names, values):
+    """ Bindings of names to values, or None if a repeated name disagrees """
+    bindings = dict()
+    for name, value in zip(names, values):
+        if name in bindings:
+            old = bindings[name]
+            if old is not value and old != value:
+                return None
+        else:
+            bindings[name] = value
+    return bindings
+
+
+def _like(expr, pattern):
+    """ The node whose representation replacements are built in
+
+    That of the matched expression, e.g. hash-consed ``Term``s for a
+    ``Term``, or else that of the pattern.
+    """
+    return expr if split(expr)[1] is not None else pattern
+
+
+def _substitute(pattern, bindings, like):
+    """ The pattern with its variables replaced by their bindings
+
+    Nodes are rebuilt in the representation of the node ``like``.
+    """
+    if isinstance(pattern, Var):
+        return bindings[pattern.name]
+    op, args = split(pattern)
+    if args is None:
+        return pattern
+    new = [_substitute(a, bindings, like) for a in args]
+    return rebuild(like, op, args_like(split(like)[1], new))
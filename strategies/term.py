@@ -1,4 +1,11 @@
-from .dispatch import dispatch
+from threading import Lock
+from weakref import WeakValueDictionary
+
+from .dispatch import dispatch, namespace, Dispatcher
+
+# the protocol dispatchers count their registrations; see ``refresh``
+for _name in ('operator', 'arguments', 'term'):
+    namespace.setdefault(_name, Dispatcher(_name))
 
 
 @dispatch((tuple, list))
@@ -14,3 +21,295 @@ def operator(seq):
 @dispatch(object, (tuple, list))
 def term(op, args):
     return (op,) + tuple(args)
+
+
+def head(expr):
+    """ The operator of a term, or the type of a leaf
+
+    >>> from strategies.term import head
+    >>> head(('add', 1, 2))
+    'add'
+    >>> head(1) is int
+    True
+    """
+    try:
+        return operator(expr)
+    except NotImplementedError:
+        return type(expr)
+
+
+def signature(expr):
+    """ The head of a term followed by the heads of its arguments
+
+    Distinguishes terms by operator, arity and the heads of their arguments.
+
+    >>> from strategies.term import signature
+    >>> signature(('add', ('mul', 2, 3), 1)) == ('add', 'mul', int)
+    True
+    """
+    try:
+        op, args = operator(expr), arguments(expr)
+    except NotImplementedError:
+        return (type(expr),)
+    return (op,) + tuple(map(head, args))
+
+
+class Args(tuple):
+    """ Arguments of a hash-consed ``Term``
+
+    ``term(op, Args(...))`` builds a ``Term`` rather than a plain tuple so
+    that traversals which rebuild nodes keep producing interned terms.
+    """
+    __slots__ = ()
+
+
+class Term(object):
+    """ A hash-consed term
+
+    Structurally identical terms are represented by the same object.  The hash
+    is computed once on construction so equality and hashing are O(1)
+    regardless of the size of the tree.
+
+    >>> from strategies.term import Term
+    >>> a = Term('add', [1, Term('mul', [2, 3])])
+    >>> b = Term('add', [1, Term('mul', [2, 3])])
+    >>> a is b
+    True
+
+    Nested tuples among the arguments are hash-consed as well
+
+    >>> a is Term('add', [1, ('mul', 2, 3)])
+    True
+    """
+    __slots__ = ('op', 'args', '_hash', '__weakref__')
+
+    _table = WeakValueDictionary()
+    _lock = Lock()
+
+    def __new__(cls, op, args=()):
+        args = Args(map(hashcons, args))
+        # leaves are keyed with their type so that e.g. 1, 1.0 and True,
+        # which compare equal, still intern to distinct terms
+        key = (type(op), op, tuple(a if type(a) is Term else (type(a), a)
+                                   for a in args))
+        try:
+            return cls._table[key]
+        except KeyError:
+            pass
+        # terms compare by identity, so two threads must never both insert
+        with cls._lock:
+            self = cls._table.get(key)
+            if self is None:
+                self = object.__new__(cls)
+                self.op = op
+                self.args = args
+                self._hash = hash(key)
+                cls._table[key] = self
+        return self
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        return self is other
+
+    def __ne__(self, other):
+        return self is not other
+
+    def __reduce__(self):
+        return (Term, (self.op, tuple(self.args)))
+
+    def __repr__(self):
+        return "Term(%r, %r)" % (self.op, list(self.args))
+
+
+def hashcons(expr):
+    """ Convert a tree of nested tuples into hash-consed ``Term``s
+
+    Leaves and existing ``Term``s are returned unchanged.
+
+    >>> from strategies.term import hashcons, unhashcons
+    >>> t = hashcons(('add', 1, ('mul', 2, 3)))
+    >>> t is hashcons(('add', 1, ('mul', 2, 3)))
+    True
+    >>> unhashcons(t)
+    ('add', 1, ('mul', 2, 3))
+    """
+    return _convert(expr, _is_tuple_term, lambda t, args: Term(t[0], args),
+                    lambda t: t[1:])
+
+
+def unhashcons(expr):
+    """ Convert hash-consed ``Term``s back into nested tuples """
+    return _convert(expr, lambda t: isinstance(t, Term),
+                    lambda t, args: (t.op,) + tuple(args), lambda t: t.args)
+
+
+def _is_tuple_term(expr):
+    return type(expr) is tuple and len(expr) > 0
+
+
+def _convert(expr, is_node, build, children):
+    """ Rebuild every node of a tree bottom-up without recursion
+
+    Shared subtrees are converted once.
+    """
+    if not is_node(expr):
+        return expr
+    done = dict()  # id(node) -> converted node
+    stack = [expr]
+    while stack:
+        node = stack[-1]
+        if id(node) in done:
+            stack.pop()
+            continue
+        pending = [a for a in children(node)
+                   if is_node(a) and id(a) not in done]
+        if pending:
+            stack.extend(pending)
+            continue
+        stack.pop()
+        done[id(node)] = build(node, [done[id(a)] if is_node(a) else a
+                                      for a in children(node)])
+    return done[id(expr)]
+
+
+@dispatch(Term)
+def arguments(t):
+    return t.args
+
+
+@dispatch(Term)
+def operator(t):
+    return t.op
+
+
+@dispatch(object, Args)
+def term(op, args):
+    return Term(op, args)
+
+
+@dispatch(object)
+def operator(expr):
+    return _method(expr, '_term_operator')
+
+
+@dispatch(object)
+def arguments(expr):
+    return _method(expr, '_term_arguments')
+
+
+def _method(expr, name):
+    try:
+        method = getattr(type(expr), name)
+    except AttributeError:
+        raise NotImplementedError("%s is not a term" % type(expr).__name__)
+    return method(expr)
+
+
+# Fast path for traversals
+#
+# Resolving operator, arguments and term through multipledispatch costs a
+# dispatch per call.  Traversals instead resolve the three functions once per
+# type and keep them here.  The tables are cleared whenever an implementation
+# of the dispatchers is registered or replaced.
+
+_protocols = dict()  # node type -> (operator, arguments, new) or None
+_builders = dict()   # (type(op), type(args)) -> term implementation or None
+_registered = [None]
+
+
+def refresh():
+    """ Forget the resolved protocol if implementations were registered
+
+    Called by traversals before they start so that the per-type tables stay
+    in step with ``operator``, ``arguments`` and ``term``.
+    """
+    state = (operator.version, arguments.version, term.version)
+    if state != _registered[0]:
+        _protocols.clear()
+        _builders.clear()
+        _registered[0] = state
+
+
+def protocol(typ):
+    """ The term protocol of a type, resolved once
+
+    Returns ``(operator, arguments, new)`` or None if expressions of this
+    type are leaves.  ``new(op, args)`` rebuilds a node; it is None when
+    nodes are rebuilt through ``term``.
+
+    A class may take part in the protocol by defining the methods
+    ``_term_operator(self)`` and ``_term_arguments(self)`` and optionally a
+    classmethod ``_term_new(cls, op, args)``.
+
+    >>> from strategies.term import protocol
+    >>> op, args, new = protocol(tuple)
+    >>> op(('add', 1, 2)), args(('add', 1, 2))
+    ('add', (1, 2))
+    >>> protocol(int) is None
+    True
+    """
+    try:
+        return _protocols[typ]
+    except KeyError:
+        pass
+    if hasattr(typ, '_term_operator') and hasattr(typ, '_term_arguments'):
+        result = (typ._term_operator, typ._term_arguments,
+                  getattr(typ, '_term_new', None))
+    else:
+        op, args = operator.dispatch(typ), arguments.dispatch(typ)
+        if op is None or args is None or op is _generic_operator:
+            result = None
+        else:
+            result = (op, args, None)
+    _protocols[typ] = result
+    return result
+
+
+def split(expr):
+    """ Operator and arguments of expr, or (None, None) for a leaf """
+    try:
+        p = _protocols[type(expr)]
+    except KeyError:
+        p = protocol(type(expr))
+    if p is None:
+        return None, None
+    try:
+        return p[0](expr), p[1](expr)
+    except NotImplementedError:  # this instance is a leaf
+        return None, None
+
+
+def rebuild(expr, op, args):
+    """ A node like expr with operator op and arguments args
+
+    Returns expr itself if its type cannot be rebuilt.
+    """
+    new = protocol(type(expr))[2]
+    if new is None:
+        key = (type(op), type(args))
+        try:
+            new = _builders[key]
+        except KeyError:
+            new = _builders[key] = term.dispatch(*key)
+        if new is None:
+            return expr
+    try:
+        return new(op, args)
+    except NotImplementedError:
+        return expr
+
+
+def args_like(children, new):
+    """ new as the arguments of a node whose arguments were children
+
+    The arguments of ``Term``s stay ``Args`` so that rebuilt terms are
+    interned; all others are passed to ``term`` as a list.
+    """
+    if type(children) is Args:
+        return Args(new)
+    return new if type(new) is list else list(new)
+
+
+_generic_operator = operator.dispatch(object)
@@ -0,0 +1,130 @@
+from strategies import aio
+from strategies.core import exhaust
+from strategies.traverse import top_down, bottom_up, top_down_once, bottom_up_once
+import asyncio
+
+
+class FakeService(object):
+    """ A stand-in for a remote rule that records how many calls overlap
+
+    Services given the same ``meter`` count their overlapping calls together.
+    """
+    def __init__(self, rule, latency=0.05, meter=None):
+        self.rule = rule
+        self.latency = latency
+        self.meter = meter or self
+        self.calls = self.active = self.peak = 0
+
+    async def __call__(self, x):
+        meter = self.meter
+        self.calls += 1
+        meter.active += 1
+        meter.peak = max(meter.peak, meter.active)
+        self.tasks = max(getattr(self, 'tasks', 0), len(asyncio.all_tasks()))
+        try:
+            await asyncio.sleep(self.latency)
+            return self.rule(x)
+        finally:
+            meter.active -= 1
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+def posdec(x):
+    if isinstance(x, int) and x > 0:
+        return x - 1
+    return x
+
+def inc(x):
+    return x + 1 if isinstance(x, int) else x
+
+expr = ('add', 1, ('mul', 2, ('neg', 3)), 4)
+
+
+def test_traversals_match_sync():
+    for sync, async_ in [(top_down, aio.top_down), (bottom_up, aio.bottom_up),
+                         (top_down_once, aio.top_down_once),
+                         (bottom_up_once, aio.bottom_up_once)]:
+        service = FakeService(inc, latency=0)
+        assert run(async_(service)(expr)) == sync(inc)(expr)
+    assert run(aio.exhaust(aio.bottom_up(posdec))(expr)) == \
+            exhaust(bottom_up(posdec))(expr)
+
+def test_siblings_run_concurrently():
+    service = FakeService(inc)
+    wide = ('add',) + tuple(range(20))
+    assert run(aio.bottom_up(service)(wide)) == ('add',) + tuple(range(1, 21))
+    assert service.peak == 20
+
+def test_limit():
+    service = FakeService(inc, latency=0.01)
+    wide = ('add',) + tuple(range(20))
+    run(aio.bottom_up(aio.limit(service, 3))(wide))
+    assert service.peak == 3
+    assert service.calls == 21
+
+def test_workers():
+    tree = ('add',) + tuple(('mul', i, ('neg', i)) for i in range(10))
+    for traversal, sync in [(aio.top_down, top_down),
+                            (aio.bottom_up, bottom_up),
+                            (aio.top_down_once, top_down_once),
+                            (aio.bottom_up_once, bottom_up_once)]:
+        for n in [1, 3]:
+            service = FakeService(inc, latency=0.001)
+            assert run(traversal(service, tree, workers=n)) == \
+                    sync(inc)(tree)
+            assert service.peak <= n
+            assert service.tasks <= n  # the caller counts as a worker
+    service = FakeService(inc, latency=0.001)
+    run(aio.bottom_up(service, tree))
+    assert service.tasks > 10
+
+def test_shared_workers_nest():
+    workers = aio.Workers(2)
+    service = FakeService(inc, latency=0.001)
+    traversal = aio.bottom_up(service, workers=workers)
+    rules = [traversal, aio.top_down(service, workers=workers)]
+    assert run(aio.minimize(rules, expr, workers=workers)) == \
+            bottom_up(inc)(expr)
+    assert run(aio.do_one(rules, expr, workers=workers)) == \
+            bottom_up(inc)(expr)
+    brls = [lambda x: [x, 1], lambda x: [2]]
+    assert run(aio.multiplex(brls, 0, workers=workers)) == [0, 1, 2]
+    assert service.tasks <= 2
+    assert workers.free == 1  # every worker came back
+
+def test_chain_condition():
+    service = FakeService(posdec, latency=0)
+    assert run(aio.chain([service, posdec, service])(5)) == 2
+    is_even = FakeService(lambda x: x % 2 == 0, latency=0)
+    assert run(aio.condition(is_even, service)(4)) == 3
+    assert run(aio.condition(is_even, service)(5)) == 5
+
+def test_do_one():
+    slow = FakeService(lambda x: 'slow', latency=3600)
+    fast = FakeService(inc, latency=0.01)
+    nothing = FakeService(lambda x: x, latency=0.02)
+    async def first_then_settle():
+        result = await aio.do_one([nothing, fast, slow])(1)
+        await asyncio.sleep(0)  # let the cancellation be delivered
+        # checked before asyncio.run cancels whatever is left
+        return result, slow.active
+    assert run(first_then_settle()) == (2, 0)  # slow was cancelled
+    assert slow.calls == 1
+    assert run(aio.do_one([nothing, nothing])(1)) == 1
+
+def test_minimize_multiplex():
+    a = FakeService(inc)
+    b = FakeService(posdec, meter=a)
+    assert run(aio.minimize([a, b])(3)) == 2
+    assert run(aio.minimize([a, b], objective=lambda x: -x)(3)) == 4
+    assert a.peak == 2  # both rules ran at once
+
+    async def coro(x):
+        return [x, x + 1]
+    async def agen(x):
+        yield x + 1
+        yield x + 2
+    assert run(aio.multiplex([coro, agen, lambda x: iter([x])])(1)) == \
+            [1, 2, 3]
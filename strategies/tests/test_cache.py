@@ -0,0 +1,40 @@
+from strategies.cache import LRUCache, LRUSet, BloomFilter
+
+def test_lru_cache():
+    cache = LRUCache(2)
+    cache['a'] = 1
+    cache['b'] = 2
+    assert cache.get('a') == 1
+    cache['c'] = 3
+    assert 'b' not in cache
+    assert cache.get('b', 'missing') == 'missing'
+    assert len(cache) == 2
+    assert cache.info() == dict(hits=1, misses=1, evictions=1, size=2,
+                                maxsize=2)
+    cache.clear()
+    assert len(cache) == 0
+
+def test_lru_cache_unbounded():
+    cache = LRUCache(None)
+    for i in range(100):
+        cache[i] = i
+    assert len(cache) == 100
+    assert cache.evictions == 0
+
+def test_lru_set():
+    s = LRUSet(3)
+    for i in range(5):
+        s.add(i)
+    assert len(s) == 3
+    assert 1 not in s and 4 in s
+    s.add(2)
+    s.add(5)
+    assert 2 in s and 3 not in s
+
+def test_bloom_filter():
+    b = BloomFilter(1000, error_rate=0.01)
+    for i in range(1000):
+        b.add(('x', i))
+    assert all(('x', i) in b for i in range(1000))
+    false_positives = sum(('y', i) in b for i in range(10000))
+    assert false_positives < 500
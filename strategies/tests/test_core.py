@@ -1,5 +1,7 @@
 from strategies.core import (exhaust, memoize, condition,
-        chain, do_one, debug, switch, minimize, null_safe)
+        chain, do_one, debug, switch, minimize, null_safe, indexed,
+        memoized, bounded_exhaust, cycle_exhaust)
+from strategies.term import Term, hashcons
 from functools import partial
 
 
@@ -77,6 +79,20 @@ def test_minimize():
 
     rl = minimize([inc, dec], objective=lambda x: -x)
     assert rl(4) == 5
+    assert minimize([inc, dec], 4) == 3
+    assert minimize([inc, dec])(4, objective=lambda x: -x) == 5
+    assert minimize(objective=lambda x: -x)([inc, dec])(4) == 5
+
+def test_minimize_cache():
+    calls = []
+    def objective(x):
+        calls.append(x)
+        return x
+    rl = minimize([lambda x: x + 1, lambda x: x - 1, lambda x: x * 1.0],
+                  objective=objective, cache=100)
+    assert rl(4) == 3 and rl(4) == 3
+    assert calls == [5, 3, 4.0]
+    assert rl(3) == 2 and calls == [5, 3, 4.0, 4, 2, 3.0]
 
 def test_do_one():
     rl1 = lambda x: 2 if x == 1 else x
@@ -85,3 +101,128 @@ def test_do_one():
     rule = do_one([rl1, rl2])
     assert rule(1) == 2
     assert rule(rule(1)) == 3
+
+def test_indexed():
+    from strategies.term import head, signature
+    calls = []
+    def rl(name, result):
+        def fn(x):
+            calls.append(name)
+            return x if result is None else result
+        return fn
+
+    rule = indexed(head, [('add', rl('add1', None)),
+                          ('mul', rl('mul', 'mul')),
+                          (None, rl('any', 'any')),
+                          ('add', rl('add2', 'add'))])
+    assert rule(('add', 1)) == 'any'
+    assert calls == ['add1', 'any']
+
+    del calls[:]
+    assert rule(('mul', 1)) == 'mul'
+    assert calls == ['mul']
+
+    del calls[:]
+    assert rule(('sub', 1)) == 'any'
+    assert calls == ['any']
+
+    rule = indexed(signature, [(('neg', 'neg'), lambda x: x[1][1])])
+    assert rule(('neg', ('neg', 1))) == 1
+    assert rule(('neg', 1)) == ('neg', 1)
+
+    rule = indexed(lambda x: x, [(1, lambda x: 2), (None, lambda x: 3)])
+    assert rule(1) == 2
+    assert rule([1]) == 3  # unhashable key
+
+def test_indexed_in_traversal():
+    from strategies.term import head
+    from strategies.traverse import bottom_up
+    rule = indexed(head, [('add', lambda x: x[1] + x[2]),
+                          ('mul', lambda x: x[1] * x[2])])
+    assert bottom_up(rule)(('add', ('mul', 2, 3), 1)) == 7
+
+def test_memoized():
+    calls = []
+    def rl(x):
+        calls.append(x)
+        return posdec(x)
+    mrl = memoized(rl, maxsize=4)
+    assert exhaust(mrl)(3) == 0
+    assert exhaust(mrl)(3) == 0
+    assert calls == [3, 2, 1, 0]
+    mrl(10)  # evicts 3, the least recently used
+    mrl(3)
+    assert calls == [3, 2, 1, 0, 10, 3]
+    assert mrl.info() == dict(hits=4, misses=6, evictions=2, size=4,
+                              maxsize=4)
+    mrl.clear()
+    assert mrl(1) == 0
+    assert calls[-1] == 1
+    assert memoized(len)([1, 2]) == 2  # unhashable inputs bypass the cache
+
+def test_memoized_weak():
+    from strategies.term import Term, arguments
+    import gc
+    rl = memoized(lambda t: Term('g', arguments(t)), weak=True)
+    t = Term('f', ['test_memoized_weak'])
+    result = rl(t)
+    assert rl(t) is result
+    assert rl.info()['hits'] == 1
+    del t, result
+    gc.collect()
+    assert len(rl.cache) == 0
+    # tuple trees would pin their hash-consed key, so they are not cached
+    assert rl(('f', 1)) is rl(('f', 1))
+    assert len(rl.cache) == 0
+    u = hashcons(('f', 1))
+    assert rl(u) is rl(u) and len(rl.cache) == 1
+    del u
+    gc.collect()
+    assert len(rl.cache) == 0
+
+def test_memoized_keeps_types():
+    double = memoized(lambda x: x * 2 if not isinstance(x, tuple) else x[1:])
+    assert double(1) == 2 and type(double(1)) is int
+    assert double(1.0) == 2.0 and type(double(1.0)) is float
+    assert double(True) == 2 and double.info()['size'] == 3
+    assert type(double(('f', 1.0))[0]) is float
+    assert type(double(('f', 1))[0]) is int
+    assert double(('f', True))[0] is True
+    assert double.info()['size'] == 6
+
+def test_bounded_exhaust():
+    stats = dict()
+    assert bounded_exhaust(posdec, 5, stats=stats) == 0
+    assert stats == dict(limit=None, steps=6)
+    assert bounded_exhaust(posdec, 5, max_steps=2, stats=stats) == 3
+    assert stats == dict(limit='max_steps', steps=2)
+
+    cycle = lambda x: (x + 1) % 4
+    assert bounded_exhaust(cycle, 1, max_steps=10, objective=lambda x: x) == 0
+    assert bounded_exhaust(cycle, 1, timeout=0.01, stats=stats) in range(4)
+    assert stats['limit'] == 'timeout'
+
+def test_cycle_exhaust():
+    assert cycle_exhaust(posdec, 5) == 0
+    for n in [2, 3, 50, 1000]:
+        for start in [0, n // 2, n - 1]:
+            assert cycle_exhaust(lambda x: (x + 1) % n, start) == 0
+            assert cycle_exhaust(lambda x: (x + 1) % n, start, window=2) == 0
+    # a tail leading into a cycle
+    rl = lambda x: x - 1 if x > 10 else (x + 1) % 10
+    assert cycle_exhaust(rl, 100, objective=lambda x: -x) == 9
+    # members are compared as values, not as strings
+    loop = lambda x: x + 1 if x < 10 else 8
+    assert cycle_exhaust(loop, 8) == cycle_exhaust(loop, 10) == 8
+    # unhashable states
+    assert cycle_exhaust(lambda l: l[::-1], [2, 1]) == [1, 2]
+
+def test_cycle_exhaust_unorderable():
+    flip = lambda x: (x[0], x[2], x[1])
+    assert cycle_exhaust(flip, ('add', 1, 'x')) == \
+            cycle_exhaust(flip, ('add', 'x', 1))
+    tflip = lambda t: Term(t.op, [t.args[1], t.args[0]])
+    a = hashcons(('add', 1, ('mul', 'x', 2)))
+    result = cycle_exhaust(tflip, a)
+    assert result is cycle_exhaust(tflip, tflip(a))
+    assert result in (a, tflip(a))
@@ -0,0 +1,102 @@
+from strategies.flat import flatten, unflatten, bottom_up
+from strategies import flat, traverse
+from strategies.term import hashcons
+import random
+import pytest
+
+
+def random_tree(n, rng):
+    if n <= 1:
+        return rng.choice([1, 2, 'x', 'y'])
+    op = rng.choice(['add', 'mul', 'neg'])
+    if op == 'neg':
+        return (op, random_tree(n - 1, rng))
+    k = rng.randint(1, n - 1)
+    return (op, random_tree(k, rng), random_tree(n - k, rng))
+
+def remove_double_neg(x):
+    if (isinstance(x, tuple) and x[0] == 'neg' and isinstance(x[1], tuple)
+            and x[1][0] == 'neg'):
+        return x[1][1]
+    return x
+
+def test_roundtrip():
+    rng = random.Random(0)
+    for i in range(20):
+        expr = random_tree(50, rng)
+        t = flatten(expr)
+        assert unflatten(t) == expr
+        assert len(t) == len(t.op) == len(t.start)
+    assert flatten(5).to_tuple() == 5
+    assert flatten(hashcons(('f', 1, ('g', 2)))).to_tuple() == \
+            ('f', 1, ('g', 2))
+
+def test_layout():
+    t = flatten(('add', 1, ('mul', 2, 'x')))
+    assert [t.symbols[c] if c >= 0 else None for c in t.op] == \
+            [None, None, None, 'mul', 'add']
+    assert list(t.arity) == [0, 0, 0, 2, 2]
+    assert list(t.start) == [0, 1, 2, 1, 0]
+    assert t.children(4) == [0, 3]
+    assert t.to_tuple(3) == ('mul', 2, 'x')
+
+def test_deep():
+    expr = 'x'
+    for i in range(10000):
+        expr = ('neg', expr)
+    t = flatten(expr)
+    assert len(t) == 10001
+    assert len(t.select(['neg'])) == 10000
+    assert bottom_up(remove_double_neg, t, heads=['neg']).to_tuple() == 'x'
+
+def test_select():
+    rng = random.Random(1)
+    expr = random_tree(200, rng)
+    t = flatten(expr)
+    idx = t.select(['neg', 'mul'])
+    assert all(t.symbols[t.op[i]] in ('neg', 'mul') for i in idx)
+    assert len(idx) == sum(1 for i in range(len(t))
+                           if t.op[i] >= 0 and
+                           t.symbols[t.op[i]] in ('neg', 'mul'))
+    assert t.select(['missing']) == []
+
+def test_bottom_up():
+    rng = random.Random(2)
+    for i in range(20):
+        expr = random_tree(60, rng)
+        expected = traverse.bottom_up(remove_double_neg)(expr)
+        t = flatten(expr)
+        assert bottom_up(remove_double_neg, t).to_tuple() == expected
+        assert bottom_up(remove_double_neg, t, heads=['neg']).to_tuple() == \
+                expected
+    t = flatten(('add', 1, 2))
+    assert bottom_up(remove_double_neg, t, heads=['neg']) is t
+
+
+def check_scans():
+    rng = random.Random(3)
+    expr = random_tree(300, rng)
+    t = flatten(expr)
+    names = [t.symbols[c] if c >= 0 else None for c in t.op]
+    codes = t.codes(['neg', 'mul'])
+    hit = flat._isin(t.op, codes)
+    assert [bool(h) for h in hit] == [n in ('neg', 'mul') for n in names]
+    assert flat._nonzero(hit) == [i for i, n in enumerate(names)
+                                  if n in ('neg', 'mul')]
+    live = flat._contains(t, hit)
+    assert [bool(l) for l in live] == \
+            [any(hit[j] for j in range(t.start[i], i + 1))
+             for i in range(len(t))]
+    assert t.select(['neg', 'mul']) == flat._nonzero(hit)
+    expected = traverse.bottom_up(remove_double_neg)(expr)
+    assert bottom_up(remove_double_neg, t, heads=['neg']).to_tuple() == \
+            expected
+
+def test_scans_numpy():
+    pytest.importorskip('numpy')
+    assert flat.numpy is not None
+    check_scans()
+
+def test_scans_python(monkeypatch):
+    monkeypatch.setattr(flat, 'numpy', None)
+    check_scans()
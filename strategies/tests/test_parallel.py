@@ -0,0 +1,140 @@
+from strategies.parallel import (batch, Rebuild, pminimize, pmultiplex,
+        shutdown)
+from strategies.core import exhaust, debug, null_safe, indexed, memoized
+from strategies.traverse import bottom_up
+from strategies.tree import compile_tree
+from strategies.term import head
+import pickle
+import threading
+
+
+def posdec(x):
+    if isinstance(x, int) and x > 0:
+        return x - 1
+    return x
+
+def neg(x):
+    return -x if isinstance(x, int) else x
+
+def test_batch():
+    strategy = exhaust(bottom_up(posdec))
+    exprs = [('add', i, ('mul', i, 2)) for i in range(100)]
+    results = batch(strategy, exprs, processes=2, chunksize=7, pending=3)
+    assert list(results) == [('add', 0, ('mul', 0, 0))] * 100
+
+def test_batch_streams():
+    def naturals():
+        i = 0
+        while True:
+            yield i
+            i += 1
+    results = batch(neg, naturals(), processes=2, chunksize=10)
+    assert [next(results) for i in range(50)] == [-i for i in range(50)]
+    results.close()
+
+def test_batch_serial():
+    assert list(batch(neg, iter([1, 2]), processes=1)) == [-1, -2]
+    assert list(batch(neg, [], processes=2)) == []
+
+def test_combinators_pickle():
+    for rl in [null_safe(posdec), debug(posdec),
+               indexed(head, [(int, posdec), (None, neg)]),
+               exhaust(bottom_up(posdec))]:
+        assert pickle.loads(pickle.dumps(rl))(3) == rl(3)
+
+def test_rebuild():
+    rl = Rebuild(compile_tree, ([posdec, neg], posdec))
+    assert rl(5) == -5
+    clone = pickle.loads(pickle.dumps(rl))
+    assert clone.strategy is None
+    assert clone(5) == -5
+    assert list(batch(Rebuild(memoized, neg), range(5), processes=2)) == \
+            [0, -1, -2, -3, -4]
+
+class Meeting(object):
+    """ Rules that each wait for all n to be running at once
+
+    Fails, rather than hangs, if they are run one after another.
+    """
+    def __init__(self, n):
+        self.barrier = threading.Barrier(n, timeout=10)
+        self.lock = threading.Lock()
+        self.active = self.peak = 0
+
+    def __call__(self, rule):
+        def rl(x):
+            with self.lock:
+                self.active += 1
+                self.peak = max(self.peak, self.active)
+            try:
+                self.barrier.wait()
+                return rule(x)
+            finally:
+                with self.lock:
+                    self.active -= 1
+        return rl
+
+def const(value):
+    return lambda x: value
+
+def test_pminimize():
+    meet = Meeting(4)
+    fns = [meet(const(v)) for v in [3, 1, 2, 1]]
+    assert pminimize(fns, None, max_workers=4) == 1
+    assert meet.peak == 4
+    assert pminimize([posdec, neg], 5, objective=abs) == 4
+    assert pminimize([posdec, neg], 5, cutoff=3) == -5
+    assert pminimize([posdec, neg], 5, executor='process') == -5
+
+def test_pminimize_ties_are_deterministic():
+    for i in range(5):
+        second_done = threading.Event()
+        def first(x):
+            assert second_done.wait(10)
+            return ('a', 1)
+        def second(x):
+            second_done.set()
+            return ('b', 1)
+        # the first function finishes last but still wins the tie
+        assert pminimize([first, second], None, objective=lambda x: x[1],
+                         max_workers=2) == ('a', 1)
+
+def test_pmultiplex():
+    meet = Meeting(3)
+    fns = [meet(lambda x, v=v: iter(v)) for v in [[1, 2], [2, 3], [4]]]
+    assert list(pmultiplex(fns, None, max_workers=3)) == [1, 2, 3, 4]
+    assert meet.peak == 3
+    fns = [lambda x, v=v: iter(v) for v in [[1, 2], [2, 3], [4]]]
+    assert list(pmultiplex(fns, None, cutoff=10)) == [1, 2, 3, 4]
+
+def test_pmultiplex_serial_is_lazy():
+    from itertools import count
+    def naturals(x):
+        return count(x)
+    results = pmultiplex([naturals, naturals], 0, cutoff=10)
+    assert next(results) == 0 and next(results) == 1
+
+def finishes(fn, timeout=10):
+    """ Run fn in a thread; its result, or fail if it does not finish """
+    result = []
+    thread = threading.Thread(target=lambda: result.append(fn()))
+    thread.daemon = True
+    thread.start()
+    thread.join(timeout)
+    assert result, 'deadlocked'
+    return result[0]
+
+def test_nested():
+    inner = pminimize([posdec, neg], max_workers=2)
+    outer = pminimize([inner, inner], max_workers=2)
+    assert finishes(lambda: outer(3)) == -3
+    brl = lambda x: iter([x, -x])
+    inner = pmultiplex([brl, brl], max_workers=2)
+    outer = pmultiplex([inner, inner], max_workers=2)
+    assert finishes(lambda: list(outer(3))) == [3, -3]
+
+def test_shutdown():
+    assert pminimize([posdec, neg], 5, max_workers=2) == -5
+    shutdown()
+    assert pminimize([posdec, neg], 5, max_workers=2) == -5
+    shutdown()
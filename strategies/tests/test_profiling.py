@@ -0,0 +1,116 @@
+from strategies.profiling import Profiler, nodes
+from strategies.core import exhaust, do_one
+from strategies.traverse import bottom_up
+from strategies.tree import greedy
+import pstats
+import os
+import tempfile
+
+
+def posdec(x):
+    return x - 1 if x > 0 else x
+
+def double(x):
+    return 2 * x
+
+def test_rule():
+    prof = Profiler()
+    rl = prof.rule(posdec)
+    assert rl.__name__ == 'posdec'
+    assert exhaust(rl)(3) == 0
+    stats = prof.as_dict()
+    assert list(stats) == ['posdec']
+    assert stats['posdec']['calls'] == 4
+    assert stats['posdec']['hits'] == 3
+    assert stats['posdec']['misses'] == 1
+    assert stats['posdec']['cumtime'] >= stats['posdec']['selftime'] >= 0
+
+def test_disabled():
+    prof = Profiler(enabled=False)
+    assert prof.rule(posdec) is posdec
+    assert prof.tree([posdec, double]) == [posdec, double]
+
+    prof = Profiler()
+    rl = prof.rule(posdec)
+    prof.enabled = False
+    assert rl(3) == 2
+    assert prof.as_dict()['posdec']['calls'] == 0
+
+def test_self_time():
+    ticks = [0]
+    def timer():
+        ticks[0] += 1
+        return ticks[0]
+    prof = Profiler(timer=timer)
+    inner = prof.rule(posdec)
+    outer = prof.rule(lambda x: inner(x), name='outer')
+    outer(5)
+    stats = prof.as_dict()
+    # inner: start=2, stop=3; outer: start=1, stop=4
+    assert stats['posdec']['cumtime'] == stats['posdec']['selftime'] == 1
+    assert stats['outer']['cumtime'] == 3
+    assert stats['outer']['selftime'] == 2
+
+def test_size():
+    prof = Profiler(size=nodes)
+    rl = bottom_up(prof.rule(lambda x: x, name='ident'))
+    rl(('add', 1, ('mul', 2, 3)))
+    stats = prof.as_dict()['ident']
+    assert stats['calls'] == 5
+    assert stats['size'] == 1 + 1 + 1 + 3 + 5
+
+def test_tree():
+    prof = Profiler()
+    tree = prof.tree([posdec, (double, posdec)])
+    assert greedy(tree)(3) == 2
+    stats = prof.as_dict()
+    assert stats['posdec']['calls'] == 1
+    assert stats['double']['calls'] == 1
+    assert stats['posdec:2']['calls'] == 1
+
+def test_as_dict_names():
+    def rule(name):
+        rl = lambda x: x
+        rl.__name__ = name
+        return rl
+    prof = Profiler()
+    for name in ['a', 'a:2', 'a', 'a']:
+        prof.rule(rule(name))
+    assert sorted(prof.as_dict()) == ['a', 'a:2', 'a:3', 'a:4']
+
+def test_branch():
+    def branch5(x):
+        if x == 5:
+            yield 4
+            yield 6
+        else:
+            yield x
+    prof = Profiler()
+    brl = prof.branch(branch5)
+    assert list(brl(5)) == [4, 6]
+    assert list(brl(3)) == [3]
+    stats = prof.as_dict()['branch5']
+    assert stats['calls'] == 2
+    assert stats['hits'] == 1
+    assert stats['size'] == 3
+
+def test_pstats():
+    prof = Profiler()
+    do_one([prof.rule(posdec), prof.rule(double)])(3)
+    ps = pstats.Stats(prof)
+    names = set(key[2] for key in ps.stats)
+    assert names == set(['posdec', 'double'])
+
+    fd, filename = tempfile.mkstemp()
+    os.close(fd)
+    try:
+        prof.dump_stats(filename)
+        assert pstats.Stats(filename).stats == ps.stats
+    finally:
+        os.remove(filename)
+
+def test_clear():
+    prof = Profiler()
+    prof.rule(posdec)(3)
+    prof.clear()
+    assert prof.as_dict()['posdec']['calls'] == 0
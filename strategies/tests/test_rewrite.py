@@ -0,0 +1,101 @@
+from strategies.rewrite import Var, RuleSet
+from strategies.core import do_one
+from strategies.traverse import bottom_up, top_down
+from strategies.branch import exhaust
+from strategies.term import hashcons, Term
+
+x, y, z = Var('x'), Var('y'), Var('z')
+
+
+def test_var():
+    assert Var('x') == x and Var('x') != y
+    assert hash(Var('x')) == hash(x)
+    assert repr(x) == "Var('x')"
+
+def test_rules():
+    rules = RuleSet([(('add', x, 0), x),
+                     (('add', 0, x), x),
+                     (('mul', x, ('add', y, z)),
+                      ('add', ('mul', x, y), ('mul', x, z)))])
+    assert len(rules) == 3
+    assert rules(('add', 'a', 0)) == 'a'
+    assert rules(('add', 0, 'a')) == 'a'
+    assert rules(('mul', 2, ('add', 'a', 'b'))) == \
+            ('add', ('mul', 2, 'a'), ('mul', 2, 'b'))
+    assert rules(('add', 'a', 1)) == ('add', 'a', 1)
+    assert rules(('add', 'a', 0, 0)) == ('add', 'a', 0, 0)
+    assert rules('a') == 'a'
+
+def test_rule_order():
+    rules = RuleSet([(('f', x, y), 'first'),
+                     (('f', 1, y), 'second')])
+    assert rules(('f', 1, 2)) == 'first'
+    assert [i for i, _ in rules.matches(('f', 1, 2))] == [0, 1]
+    rules = RuleSet([(('f', 1, y), 'second'),
+                     (('f', x, y), 'first')])
+    assert rules(('f', 1, 2)) == 'second'
+
+def test_skips_rules_without_effect():
+    rules = RuleSet([(('f', x), ('f', x)),
+                     (('f', x), x)])
+    assert rules(('f', 1)) == 1
+
+def test_nonlinear():
+    rules = RuleSet([(('sub', x, x), 0)])
+    assert rules(('sub', ('f', 1), ('f', 1))) == 0
+    assert rules(('sub', ('f', 1), ('f', 2))) == ('sub', ('f', 1), ('f', 2))
+
+def test_bindings():
+    rules = RuleSet([(('f', x, ('g', y)), 'a'),
+                     (('f', x, y), 'b')])
+    assert list(rules.matches(('f', 1, ('g', 2)))) == \
+            [(0, {'x': 1, 'y': 2}), (1, {'x': 1, 'y': ('g', 2)})]
+
+def test_callable_and_condition():
+    rules = RuleSet([(('add', x, y), lambda x, y: x + y,
+                      lambda x, y: isinstance(x, int) and isinstance(y, int))])
+    assert rules(('add', 1, 2)) == 3
+    assert rules(('add', 1, 'a')) == ('add', 1, 'a')
+
+def test_matches_do_one():
+    pairs = [(('add', x, 0), x), (('mul', x, 1), x), (('mul', x, 0), 0),
+             (('neg', ('neg', x)), x), (('sub', x, x), 0)]
+    rules = RuleSet(pairs)
+    slow = do_one([RuleSet([pair]) for pair in pairs])
+    exprs = [('add', 'a', 0), ('mul', ('neg', ('neg', 'b')), 1),
+             ('mul', 3, 0), ('sub', 'c', 'c'), ('sub', 'c', 'd'), 5]
+    for e in exprs:
+        assert rules(e) == slow(e)
+    expr = ('add', ('mul', ('neg', ('neg', 'a')), 1), ('sub', 'b', 'b'))
+    assert bottom_up(rules)(expr) == 'a'
+    assert bottom_up(slow)(expr) == 'a'
+
+def test_branch():
+    rules = RuleSet([(('add', x, y), ('add', y, x)),
+                     (('add', x, 0), x)])
+    assert list(rules.branch(('add', 'a', 0))) == [('add', 0, 'a'), 'a']
+    assert set(exhaust(rules.branch)(('add', 'a', 0))) == {'a'}
+
+def test_terms():
+    rules = RuleSet([(('neg', ('neg', x)), x)])
+    expr = hashcons(('add', ('neg', ('neg', 1)), 2))
+    result = top_down(rules)(expr)
+    assert result == hashcons(('add', 1, 2))
+    assert isinstance(result, Term)
+
+def test_terms_keep_their_representation():
+    rules = RuleSet([(('mul', x, ('add', y, z)),
+                      ('add', ('mul', x, y), ('mul', x, z))),
+                     ('zero', ('num', 0))])
+    expr = hashcons(('mul', 2, ('add', 'a', 'b')))
+    result = rules(expr)
+    assert isinstance(result, Term)
+    assert result is hashcons(('add', ('mul', 2, 'a'), ('mul', 2, 'b')))
+    assert list(rules.branch(expr)) == [result]
+    assert rules(('mul', 2, ('add', 'a', 'b'))) == \
+            ('add', ('mul', 2, 'a'), ('mul', 2, 'b'))
+    assert rules('zero') == ('num', 0)  # a leaf takes the pattern's form
+
+def test_unhashable_leaf():
+    rules = RuleSet([(('f', 1), 2), (('f', x), x)])
+    assert rules(('f', [1])) == [1]
@@ -0,0 +1,227 @@
+from strategies.term import (term, operator, arguments, Term, hashcons,
+        unhashcons, protocol, split, rebuild)
+from strategies.dispatch import dispatch
+from strategies.core import exhaust
+from strategies.traverse import top_down, bottom_up
+from strategies.branch import multiplex
+import pickle
+import sys
+import threading
+
+
+def test_tuple_protocol():
+    t = ('add', 1, 2)
+    assert operator(t) == 'add'
+    assert arguments(t) == (1, 2)
+    assert term('add', [1, 2]) == t
+
+
+def test_interning():
+    a = Term('add', [1, Term('mul', [2, 3])])
+    b = Term('add', (1, Term('mul', (2, 3))))
+    assert a is b
+    assert hash(a) == hash(b)
+    assert a != Term('add', [1, Term('mul', [2, 4])])
+    assert len(set([a, b])) == 1
+
+
+def test_interning_keeps_leaf_types():
+    a = Term('f', [1])
+    b, c = Term('f', [1.0]), Term('f', [True])
+    assert a is not b and a is not c and b is not c
+    assert type(unhashcons(b)[1]) is float
+    assert type(unhashcons(c)[1]) is bool
+    assert Term(1, []) is not Term(1.0, [])
+    assert Term('f', [1]) is a
+
+
+def test_interning_across_threads():
+    n = 20000
+    results = [[], []]
+    def build(out):
+        for i in range(n):
+            out.append(Term('threaded', ['k', i]))
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=build, args=(out,))
+                   for out in results]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert all(a is b for a, b in zip(*results))
+
+
+def test_hashcons():
+    expr = ('add', ('mul', 2, 3), ('mul', 2, 3))
+    t = hashcons(expr)
+    assert isinstance(t, Term)
+    assert t.args[0] is t.args[1]
+    assert unhashcons(t) == expr
+    assert hashcons(5) == 5
+    assert hashcons(t) is t
+
+
+def test_term_protocol():
+    t = hashcons(('add', 1, 2))
+    assert operator(t) == 'add'
+    assert tuple(arguments(t)) == (1, 2)
+    assert term('add', arguments(t)) is t
+
+
+def test_traversals_preserve_interning():
+    inc = lambda x: x + 1 if isinstance(x, int) else x
+    t = hashcons(('add', 1, ('mul', 2, 3)))
+    expected = hashcons(('add', 2, ('mul', 3, 4)))
+    assert top_down(inc)(t) is expected
+    assert bottom_up(inc)(t) is expected
+
+
+def test_exhaust():
+    def shrink(t):
+        if isinstance(t, Term) and t.op == 'neg' and isinstance(t.args[0], Term):
+            return t.args[0].args[0]
+        return t
+    t = hashcons(('neg', ('neg', ('neg', ('neg', 1)))))
+    assert exhaust(shrink)(t) == 1
+
+
+def test_multiplex():
+    def same(t):
+        yield hashcons(('a', 1))
+    def other(t):
+        yield Term('a', [1])
+    assert list(multiplex([same, other])(None)) == [Term('a', [1])]
+
+
+def test_pickle():
+    t = hashcons(('add', 1, ('mul', 2, 3)))
+    assert pickle.loads(pickle.dumps(t)) is t
+
+def test_hashcons_shared_and_deep():
+    expr = 1
+    for i in range(200):
+        expr = ('add', expr, expr)
+    t = hashcons(expr)
+    assert t.args[0] is t.args[1]
+    u = unhashcons(t)
+    assert u[1] is u[2]
+
+    expr = 1
+    for i in range(10000):
+        expr = ('neg', expr)
+    t = unhashcons(hashcons(expr))
+    for i in range(10000):
+        t = t[1]
+    assert t == 1
+
+
+class Node(object):
+    """ A user class taking part in the term protocol through methods """
+    def __init__(self, op, *args):
+        self.op, self.args = op, args
+
+    def _term_operator(self):
+        return self.op
+
+    def _term_arguments(self):
+        return self.args
+
+    @classmethod
+    def _term_new(cls, op, args):
+        return cls(op, *args)
+
+    def __eq__(self, other):
+        return (type(other) is Node and
+                (self.op, self.args) == (other.op, other.args))
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.op, self.args))
+
+
+def test_protocol_methods():
+    inc = lambda x: x + 1 if isinstance(x, int) else x
+    n = Node('add', 1, Node('mul', 2, 3))
+    assert operator(n) == 'add'
+    assert arguments(n) == (1, Node('mul', 2, 3))
+    assert split(n) == ('add', (1, Node('mul', 2, 3)))
+    assert bottom_up(inc)(n) == Node('add', 2, Node('mul', 3, 4))
+    assert protocol(int) is None
+    assert split(5) == (None, None)
+
+
+class Pair(object):
+    def __init__(self, a, b):
+        self.a, self.b = a, b
+
+
+def _unregister(cls):
+    for d in (operator, arguments):
+        if (cls,) in d.funcs:
+            d.remove((cls,))
+
+
+def test_protocol_follows_registrations():
+    p = Pair(1, 2)
+    zero = lambda x: 0 if x == 1 else x
+    try:
+        assert top_down(zero)(p) is p  # a leaf
+
+        @operator.register(Pair)
+        def _pair_op(p):
+            return 'pair'
+        @arguments.register(Pair)
+        def _pair_args_v1(p):
+            return (p.a, p.b)
+
+        result = top_down(zero)(p)
+        assert result == ('pair', 0, 2)  # rebuilt through term on tuples
+        assert rebuild(p, 'pair', frozenset([3])) is p  # no term for sets
+
+        # replacing an implementation is noticed as well
+        @arguments.register(Pair)
+        def _pair_args_v2(p):
+            return (p.a, p.a)
+        assert top_down(zero)(p) == ('pair', 0, 0)
+    finally:
+        _unregister(Pair)
+    assert top_down(zero)(p) is p
+
+
+class Box(object):
+    def __init__(self, *args):
+        self.args = args
+
+    def __eq__(self, other):
+        return type(other) is Box and self.args == other.args
+
+
+def test_instances_may_be_leaves():
+    inc = lambda x: x + 1 if isinstance(x, int) else x
+    try:
+        @dispatch(Box)
+        def operator(b):
+            return Box
+        @dispatch(Box)
+        def arguments(b):
+            if not b.args:
+                raise NotImplementedError()  # empty boxes are leaves
+            return b.args
+        @dispatch(type, tuple)
+        def term(op, args):
+            if op is Box:
+                return Box(*args)
+            raise NotImplementedError()
+
+        assert split(Box()) == (None, None)
+        assert bottom_up(inc)(Box(1, Box())) == Box(2, Box())
+        assert rebuild(('f', 1), int, (2,)) == ('f', 1)
+    finally:
+        _unregister(Box)
+        term.remove((type, tuple))
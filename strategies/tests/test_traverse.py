@@ -1,5 +1,7 @@
 from strategies.traverse import (top_down, bottom_up, sall, top_down_once,
-        bottom_up_once)
+        bottom_up_once, top_down_memo, bottom_up_memo, top_down_once_memo,
+        bottom_up_once_memo, innermost, outermost, RewriteCache)
+from strategies.core import exhaust
 from strategies.term import term, operator, arguments
 
 zero_symbols = lambda x: 0 if isinstance(x, str) else x
@@ -27,6 +29,24 @@ def _(x):
 def _(op, args):
     return op(*args)
 
+class Node(Basic):
+    pass
+
+@operator.register(Node)
+def _(x):
+    return Node
+
+@arguments.register(Node)
+def _(x):
+    return tuple(x.args)  # rebuilt through term(type, list) above
+
+def test_tuple_arguments_list_term():
+    inc = lambda x: x + 1 if isinstance(x, int) else x
+    expr = Node(1, Node(2))
+    assert bottom_up(inc)(expr) == Node(2, Node(3))
+    assert top_down(inc)(expr) == Node(2, Node(3))
+    assert sall(inc)(expr) == Node(2, Node(2))
+
 def test_sall():
     zero_onelevel = sall(zero_symbols)
 
@@ -74,3 +94,261 @@ def test_bottom_up_once():
 
     assert bottom_rl(Basic(1, 2, Basic(3, 4))) == \
                      Basic(1, 2, Basic2(3, 4))
+
+def test_sall_reuses_unchanged_nodes():
+    expr = Basic(1, 2, Basic(3, 4))
+    assert sall(lambda x: x)(expr) is expr
+    assert sall(zero_symbols)(expr) is expr
+
+    new = sall(lambda x: x + 1 if isinstance(x, int) else x)(expr)
+    assert new is not expr
+    assert new.args[2] is expr.args[2]
+
+def test_traversals_reuse_unchanged_nodes():
+    expr = Basic(1, 2, Basic(3, Basic(4)))
+    for trav in (top_down, bottom_up, top_down_once, bottom_up_once):
+        assert trav(zero_symbols)(expr) is expr
+
+    new = bottom_up(zero_symbols)(Basic(x, Basic(1, 2)))
+    assert new == Basic(0, Basic(1, 2))
+
+    child = Basic(1, 2)
+    assert bottom_up(zero_symbols)(Basic(x, child)).args[1] is child
+
+def _dag(depth):
+    expr = 1
+    for i in range(depth):
+        expr = ('add', expr, expr)
+    return expr
+
+def test_memo_traversals_match():
+    inc = lambda x: x + 1 if isinstance(x, int) else x
+    expr = ('f', _dag(3), ('g', 1, 'x'), _dag(2))
+    pairs = [(top_down, top_down_memo), (bottom_up, bottom_up_memo),
+             (top_down_once, top_down_once_memo),
+             (bottom_up_once, bottom_up_once_memo)]
+    for trav, memo in pairs:
+        assert memo(inc)(expr) == trav(inc)(expr)
+        assert memo(inc, maxsize=1)(expr) == trav(inc)(expr)
+
+def test_memo_rewrites_shared_subterms_once():
+    calls = []
+    def rl(x):
+        calls.append(x)
+        return x
+    expr = _dag(12)
+    stats = {}
+    assert bottom_up_memo(rl, stats=stats)(expr) == expr
+    assert len(calls) == 13
+    assert stats == {'hits': 12, 'misses': 13}
+
+    bottom_up_memo(rl, stats=stats)(expr)
+    assert stats == {'hits': 24, 'misses': 26}
+
+def test_memo_keeps_leaf_types():
+    inc = lambda x: x + 1 if isinstance(x, (int, float)) else x
+    expr = ('f', 1, 1.0, ('g', 1), ('g', 1.0))
+    for trav, memo in [(top_down, top_down_memo), (bottom_up, bottom_up_memo)]:
+        result = memo(inc)(expr)
+        assert result == trav(inc)(expr)
+        assert [type(a) for a in result[1:3]] == [int, float]
+        assert type(result[4][1]) is float
+
+def test_memo_dags_are_linear():
+    calls = []
+    def rl(x):
+        calls.append(x)
+        return x
+    expr = _dag(200)  # 2 ** 200 paths
+    assert bottom_up_memo(rl)(expr) is expr
+    assert top_down_memo(rl)(expr) is expr
+    assert len(calls) == 2 * 201
+
+def test_memo_unhashable_terms():
+    expr = Basic(x, Basic(y, 1))
+    assert top_down_memo(zero_symbols)(expr) == Basic(0, Basic(0, 1))
+
+def test_deep_trees():
+    inc = lambda x: x + 1 if isinstance(x, int) else x
+    expr = 0
+    for i in range(10000):
+        expr = ('neg', expr)
+    for trav in (top_down, bottom_up):
+        result = trav(inc)(expr)
+        for i in range(10000):
+            result = result[1]
+        assert result == 1
+
+def test_deep_terms():
+    # Comparing and hashing deep tuples recurses so use hash-consed terms
+    from strategies.term import Term
+    inc = lambda x: x + 1 if isinstance(x, int) else x
+    expr = 0
+    for i in range(10000):
+        expr = Term('neg', [expr])
+    for trav in (top_down_once, bottom_up_once, top_down_memo,
+                 bottom_up_memo):
+        result = trav(inc)(expr)
+        for i in range(10000):
+            result = result.args[0]
+        assert result == 1
+
+def add_zero(x):
+    """ add(0, y) -> y """
+    if isinstance(x, tuple) and x[:2] == ('add', 0):
+        return x[2]
+    return x
+
+def test_innermost_outermost():
+    expr = ('add', 0, ('mul', ('add', 0, 'x'), ('add', 0, ('add', 0, 1))))
+    expected = exhaust(bottom_up(add_zero))(expr)
+    assert expected == ('mul', 'x', 1)
+    assert innermost(add_zero)(expr) == expected
+    assert outermost(add_zero)(expr) == expected
+
+    assert innermost(add_zero)(5) == 5
+    assert innermost(zero_symbols)(Basic(x, Basic(y, 1))) == \
+            Basic(0, Basic(0, 1))
+    assert outermost(zero_symbols)(Basic(x, Basic(y, 1))) == \
+            Basic(0, Basic(0, 1))
+
+def test_normalize_reuses_normal_forms():
+    expr = ('f', ('g', 1, 2), ('h', 3))
+    for norm in (innermost, outermost):
+        assert norm(add_zero)(expr) is expr
+
+def test_innermost_order():
+    # f(g(a)) -> b at the root competes with g(a) -> c below it
+    def rl(x):
+        if x == ('f', ('g', 'a')):
+            return 'b'
+        if x == ('g', 'a'):
+            return 'c'
+        return x
+    assert innermost(rl)(('f', ('g', 'a'))) == ('f', 'c')
+    assert outermost(rl)(('f', ('g', 'a'))) == 'b'
+
+def test_normalize_only_revisits_changed_paths():
+    calls = []
+    def rl(x):
+        calls.append(x)
+        return add_zero(x)
+    expr = ('add', 0, ('f',) + tuple(('g', i) for i in range(100)))
+    assert innermost(rl)(expr) == expr[2]
+    # each node once, plus the root and its replacement once more
+    assert len(calls) < 2 * 100 + 10
+
+def test_outermost_rebuilds_once_per_changed_node(monkeypatch):
+    from strategies import traverse
+    from strategies.term import rebuild
+    rebuilds = []
+    def counting(expr, op, args):
+        rebuilds.append(expr)
+        return rebuild(expr, op, args)
+    monkeypatch.setattr(traverse, 'rebuild', counting)
+    # every child of the wide root has a redex below it
+    expr = ('f',) + tuple(('g', ('add', 0, i)) for i in range(1000))
+    assert outermost(add_zero)(expr) == ('f',) + tuple(('g', i)
+                                                       for i in range(1000))
+    # each ('g', ...) once and the root once, not the root once per rewrite
+    assert len(rebuilds) == 1000 + 1
+
+def test_normalize_deep_trees():
+    from strategies.term import Term
+    def rl(t):
+        if isinstance(t, Term) and t.op == 'add' and t.args[0] == 0:
+            return t.args[1]
+        return t
+    expr = 1
+    for i in range(10000):
+        expr = Term('add', [0, expr])
+    for norm in (innermost, outermost):
+        assert norm(rl)(expr) == 1
+
+def test_rewrite_cache():
+    from strategies.term import hashcons
+    calls = []
+    def rl(x):
+        calls.append(x)
+        if isinstance(x, int):
+            return x + 1
+        return x
+    expr = ('f', ('g', 1, 2), ('h', ('k', 3), 4))
+    session = RewriteCache()
+    assert session.top_down(rl, expr) == top_down(rl, expr)
+    assert session.bottom_up(rl, expr) == bottom_up(rl, expr)
+    def unneg(x):
+        if isinstance(x, tuple) and x[0] == 'neg' and isinstance(x[1], tuple):
+            return x[1][1]
+        return x
+    assert session.normalize(unneg, ('f', ('neg', ('neg', 1)))) == ('f', 1)
+
+    # an edit deep in a large hash-consed tree touches only its path
+    leaves = [hashcons(('leaf', i)) for i in range(64)]
+    def tree(leaves):
+        while len(leaves) > 1:
+            leaves = [hashcons(('add', a, b))
+                      for a, b in zip(leaves[::2], leaves[1::2])]
+        return leaves[0]
+    session.bottom_up(rl, tree(leaves))
+    del calls[:]
+    leaves[5] = hashcons(('leaf', 'edited'))
+    session.bottom_up(rl, tree(leaves))
+    assert len(calls) == 2 + 6  # the new leaf, its argument and ancestors
+
+    # invalidation
+    session.invalidate(rl)
+    del calls[:]
+    session.bottom_up(rl, tree(leaves))
+    assert len(calls) > 100
+    session.invalidate()
+    assert session.info()['size'] == 0
+
+def test_rewrite_cache_normalize_long_chains():
+    posdec = lambda x: x - 1 if isinstance(x, int) and x > 0 else x
+    session = RewriteCache()
+    assert session.normalize(posdec, 5000) == 0
+    assert session.normalize(posdec, ('f', 6000, ('g', 4000))) == \
+            innermost(posdec, ('f', 6000, ('g', 4000)))
+    # rewrites that build new structure are normalized as well
+    def grow(x):
+        if isinstance(x, int) and x > 0:
+            return ('s', x - 1)
+        return x
+    expr = session.normalize(grow, 3)
+    assert expr == innermost(grow, 3) == ('s', ('s', ('s', 0)))
+
+def test_rewrite_cache_bounded():
+    session = RewriteCache(maxsize=10)
+    expr = ('f',) + tuple(range(100))
+    assert session.bottom_up(lambda x: x, expr) is expr
+    assert session.info()['size'] == 10
+
+def test_rewrite_cache_forgets_collected_rules():
+    import gc
+    session = RewriteCache(maxsize=100)
+    for i in range(1000):
+        session.bottom_up(lambda x, i=i: x, ('f', i))
+    gc.collect()
+    assert len(session.versions) == 0
+    keep = lambda x: x
+    session.bottom_up(keep, ('f', 1))
+    session.invalidate(keep)
+    assert len(session.versions) == 1
+
+def test_rewrite_cache_keeps_leaf_types():
+    from strategies.term import hashcons
+    inc = lambda x: x + 1 if isinstance(x, (int, float)) else x
+    session = RewriteCache()
+    assert session.bottom_up(inc, ('f', 1)) == ('f', 2)
+    result = session.bottom_up(inc, ('f', 1.0))
+    assert result == ('f', 2.0) and type(result[1]) is float
+    assert session.bottom_up(inc, hashcons(('f', 1))) == hashcons(('f', 2))
+    result = session.bottom_up(inc, hashcons(('f', True)))
+    assert result == hashcons(('f', 2)) and result is not hashcons(('f', 1))
+    dec = lambda x: x - 1 if isinstance(x, float) and x > 0 else x
+    assert session.normalize(dec, ('g', 2)) == ('g', 2)
+    result = session.normalize(dec, ('g', 2.0))
+    assert result == ('g', 0.0) and type(result[1]) is float
+    result = session.normalize(dec, ('g', 1.5))
+    assert result == ('g', -0.5) and type(result[1]) is float
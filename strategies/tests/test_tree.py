@@ -1,5 +1,5 @@
 from strategies.tree import (treeapply, treeapply, greedy, allresults,
-        brute)
+        brute, compile_tree, best_first, beam)
 from functools import partial, reduce
 
 def test_treeapply():
@@ -54,6 +54,68 @@ def test_greedy():
     highest = greedy(tree, objective=lambda x: -x)
     assert highest(10) == 12
 
+def test_greedy_lookahead():
+    inc = lambda x: x + 1
+    dec = lambda x: x - 1
+    double = lambda x: 2*x
+    near10 = lambda x: abs(x - 10)
+    tree = ([inc, double], double)
+    assert greedy(tree, objective=near10)(4) == 16
+    assert greedy(tree, objective=near10, lookahead=1)(4) == 10
+
+    # with enough lookahead greedy agrees with brute
+    tree = ([inc, dec, double], [inc, (dec, double)], [double, dec],
+            [(inc, inc), dec])
+    for objective in [near10, lambda x: -x, lambda x: x % 7]:
+        best = brute(tree, objective=objective)
+        for x in range(-3, 6):
+            result = greedy(tree, objective=objective, lookahead=4)(x)
+            assert objective(result) == objective(best(x))
+
+def test_greedy_lookahead_leaf():
+    inc = lambda x: x + 1
+    double = lambda x: 2*x
+    names = {inc: 'inc', double: 'double'}
+    calls = []
+    def leaf(fn):
+        def rl(x):
+            calls.append(names[fn])
+            return fn(x)
+        return rl
+    tree = ([inc, double], double)
+    near10 = lambda x: abs(x - 10)
+    assert greedy(tree, objective=near10, lookahead=1, leaf=leaf)(4) == 10
+    assert set(calls) == set(['inc', 'double'])
+
+def test_greedy_cache():
+    calls = []
+    def objective(x):
+        calls.append(x)
+        return -x
+    inc = lambda x: x + 1
+    same = lambda x: x
+    tree = ([inc, same], [inc, same])
+    fn = greedy(tree, objective=objective, cache=100)
+    assert fn(0) == 2 and fn(0) == 2
+    assert sorted(calls) == [0, 1, 2]  # 1 is seen at both choices
+    assert greedy(tree, objective=objective, cache=100, lookahead=2)(0) == 2
+
+    # equal results of different types are scored apart
+    floats_first = lambda x: 0 if isinstance(x, float) else 1
+    fn = greedy([same, float], objective=floats_first, cache=100)
+    assert type(fn(2)) is float
+
+def test_pickle():
+    import pickle
+    from operator import neg
+    from strategies.core import minimize
+    tree = ([neg, abs], (float, [abs, neg]))
+    for fn in [greedy(tree), greedy(tree, cache=10),
+               greedy(tree, lookahead=2), greedy(tree, cache=10, lookahead=2),
+               brute(tree), best_first(tree), beam(tree, width=2),
+               minimize([neg, abs], cache=10)]:
+        assert pickle.loads(pickle.dumps(fn))(3) == fn(3)
+
 def test_allresults():
     inc = lambda x: x+1
     dec = lambda x: x-1
@@ -76,3 +138,103 @@ def test_brute():
     assert fn(-2) == (-2 - 1)**2
 
     assert brute(inc)(1) == 2
+
+def test_compile_tree_greedy():
+    inc = lambda x: x + 1
+    dec = lambda x: x - 1
+    double = lambda x: 2*x
+    trees = [inc, (), (inc, double), [inc, (dec, double)],
+             [inc, dec, [inc, dec, [(inc, inc), (dec, dec)]]],
+             ([inc, dec], (double, [inc, (double, dec)]), [dec])]
+    objectives = [lambda x: x, lambda x: -x, lambda x: abs(x - 7)]
+    for tree in trees:
+        for objective in objectives:
+            fn = compile_tree(tree, objective=objective)
+            expected = greedy(tree, objective=objective)
+            for x in range(-3, 10):
+                assert fn(x) == expected(x)
+
+def test_compile_tree_ties():
+    first = lambda x: ('first', x)
+    second = lambda x: ('second', x)
+    fn = compile_tree([first, second], objective=lambda x: 0)
+    assert fn(1) == ('first', 1)
+
+def test_compile_tree_allresults():
+    inc = lambda x: x+1
+    dec = lambda x: x-1
+    double = lambda x: x*2
+
+    assert list(compile_tree(inc, 'allresults')(3)) == [4]
+    assert list(compile_tree((), 'allresults')(3)) == [3]
+    assert list(compile_tree([], 'allresults')(3)) == []
+    assert sorted(compile_tree([inc, dec], 'allresults')(3)) == [2, 4]
+    assert list(compile_tree((inc, dec), 'allresults')(3)) == [3]
+    assert sorted(compile_tree([inc, (dec, double)], 'allresults')(4)) == [5, 6]
+    # results are deduplicated within each choice
+    assert list(compile_tree([inc, [inc, inc]], 'allresults')(1)) == [2]
+    assert sorted(compile_tree(([inc, dec], [inc, dec]), 'allresults')(0)) == \
+            [-2, 0, 0, 2]
+
+def test_compile_tree_long_chains():
+    inc = lambda x: x+1
+    dec = lambda x: x-1
+    tree = tuple([inc, (dec, inc, inc)] for i in range(30))
+    assert list(compile_tree(tree, 'allresults')(0)) == [30]
+    assert compile_tree(tree, 'brute')(0) == 30
+    assert compile_tree(tree, 'greedy')(0) == 30
+
+def test_compile_tree_brute():
+    inc = lambda x: x+1
+    dec = lambda x: x-1
+    square = lambda x: x**2
+    tree = ([inc, dec], square)
+    fn = compile_tree(tree, 'brute', objective=lambda x: -x)
+
+    assert fn(2) == (2 + 1)**2
+    assert fn(-2) == (-2 - 1)**2
+    assert compile_tree(inc, 'brute')(1) == 2
+
+def test_best_first():
+    inc = lambda x: x+1
+    dec = lambda x: x-1
+    double = lambda x: x*2
+    square = lambda x: x**2
+    tree = ([inc, dec, double], [square, (inc, double)], [dec, inc])
+    for objective in (lambda x: x, lambda x: -x, lambda x: abs(x - 10)):
+        expected = compile_tree(tree, 'brute', objective=objective)
+        fn = best_first(tree, objective=objective,
+                        lower_bound=lambda x: -float('inf'))
+        for x in range(-3, 5):
+            assert objective(fn(x)) == objective(expected(x))
+
+    assert best_first(inc)(1) == 2
+    assert best_first(())(1) == 1
+
+def test_best_first_prunes():
+    calls = []
+    def dec(x):
+        calls.append(x)
+        return x - 1
+    inc = lambda x: x + 1
+    tree = tuple([dec, inc] for i in range(12))
+    # each operation changes the value by one so x - remaining is a bound;
+    # the bound below is looser but still admissible
+    fn = best_first(tree, lower_bound=lambda x: x - 12)
+    assert fn(0) == -12
+    assert len(calls) < 2 ** 12
+
+def test_best_first_greedy():
+    inc = lambda x: x + 1
+    dec = lambda x: x - 1
+    assert best_first(([inc, dec], [inc, dec]))(0) == -2
+
+def test_beam():
+    inc = lambda x: x+1
+    dec = lambda x: x-1
+    double = lambda x: x*2
+    tree = ([inc, dec, double], [double, (inc, double)], [dec, inc])
+    expected = compile_tree(tree, 'brute', objective=lambda x: -x)
+    assert beam(tree, width=100, objective=lambda x: -x)(3) == expected(3)
+    assert beam(tree, width=1)(3) == greedy(tree)(3)
+    assert beam(inc)(1) == 2
@@ -1,36 +1,508 @@
 """ Strategies to Traverse a Tree """
-from .core import chain, do_one
-from .term import operator, arguments, term
+from functools import partial
+import weakref
+from .core import do_one
+from .term import Term, split, rebuild, refresh, args_like
+from .cache import LRUCache
 from toolz import curry
 
 @curry
 def top_down(rule, x):
     """ Apply a rule down a tree running it on the top nodes first """
-    return chain([rule, lambda expr: sall(top_down(rule))(expr)], x)
+    return _walk(x, pre=rule)
 
 @curry
 def bottom_up(rule, x):
     """ Apply a rule down a tree running it on the bottom nodes first """
-    return chain([lambda expr: sall(bottom_up(rule))(expr), rule], x)
+    return _walk(x, post=rule)
 
 @curry
 def top_down_once(rule, x):
     """ Apply a rule down a tree - stop on success """
-    return do_one([rule, lambda expr: sall(top_down(rule))(expr)], x)
+    return do_one([rule, sall(top_down(rule))], x)
 
 @curry
 def bottom_up_once(rule, x):
     """ Apply a rule up a tree - stop on success """
-    return do_one([lambda expr: sall(bottom_up(rule))(expr), rule], x)
+    return do_one([sall(bottom_up(rule)), rule], x)
 
 @curry
 def sall(rule, expr):
-    """ Strategic all - apply rule to args """
-    try:
-        op = operator(expr)
-        children = arguments(expr)
-        if children:
-            children = list(map(rule, children))
-        return term(op, children)
-    except NotImplementedError:
+    """ Strategic all - apply rule to args
+
+    If the rule returns every child unchanged (the very same object) then
+    ``expr`` itself is returned and no new node is built.  ``result is expr``
+    is therefore a cheap test that nothing changed.
+    """
+    refresh()
+    op, children = _split(expr)
+    if not children:
         return expr
+    return _rebuild(expr, op, children, list(map(rule, children)))
+
+
+@curry
+def innermost(rule, x):
+    """ Rewrite a tree to normal form, reducing innermost redexes first
+
+    Equivalent to ``exhaust(bottom_up(rule))`` for a confluent rule.  Subtrees
+    known to be in normal form are remembered, so after a rewrite only the
+    new node and then its ancestors are examined again.
+
+    >>> from strategies.traverse import innermost
+    >>> def rl(x):
+    ...     if isinstance(x, tuple) and x[:2] == ('add', 0):
+    ...         return x[2]
+    ...     return x
+    >>> innermost(rl, ('add', 0, ('mul', ('add', 0, 'x'), ('add', 0, 1))))
+    ('mul', 'x', 1)
+    """
+    return _innermost(rule, x)
+
+@curry
+def outermost(rule, x):
+    """ Rewrite a tree to normal form, reducing outermost redexes first
+
+    A node is rewritten before its children.  A node whose children were
+    rewritten is examined again once they are all in normal form, so after a
+    rewrite only the changed node and its ancestors are examined again.
+
+    See Also:
+        innermost
+    """
+    return _outermost(rule, x)
+
+
+_missing = object()
+
+_split = split
+
+def _rebuild(expr, op, children, new):
+    """ Rebuild expr with new children, reusing expr if nothing changed """
+    for a, b in zip(new, children):
+        if a is not b:
+            break
+    else:
+        return expr
+    return rebuild(expr, op, args_like(children, new))
+
+def _walk(x, pre=None, post=None, cache=None):
+    """ Rewrite every node of a tree without recursion
+
+    ``pre`` is applied to a node before its children are visited and ``post``
+    after the node has been rebuilt from its rewritten children.  If a
+    ``cache`` mapping is given then results are looked up and stored under the
+    original node.
+
+    An explicit stack replaces the call stack so trees of any depth can be
+    traversed.
+    """
+    refresh()
+    stack = []
+    node = x
+    while True:
+        result = _missing
+        if cache is not None:
+            try:
+                result = cache.get(node, _missing)
+            except TypeError:
+                pass
+        if result is _missing:
+            orig = node
+            if pre is not None:
+                node = pre(node)
+            op, children = _split(node)
+            if children:
+                stack.append((orig, node, op, children, []))
+                node = children[0]
+                continue
+            result = node if post is None else post(node)
+            if cache is not None:
+                _store(cache, orig, result)
+
+        while stack:
+            orig, parent, op, children, done = stack[-1]
+            done.append(result)
+            if len(done) < len(children):
+                node = children[len(done)]
+                break
+            stack.pop()
+            result = _rebuild(parent, op, children, done)
+            if post is not None:
+                result = post(result)
+            if cache is not None:
+                _store(cache, orig, result)
+        else:
+            return result
+
+class _IdentityCache(object):
+    """ An LRU cache keyed on the identity of its keys
+
+    Lookups cost the same whatever the size of the key, and keys that are
+    equal but distinct, e.g. ``1`` and ``1.0``, are kept apart.  Each entry
+    holds its key, so the key stays alive, and its id unused, while cached.
+    """
+    __slots__ = ('cache',)
+
+    def __init__(self, maxsize):
+        self.cache = LRUCache(maxsize)
+
+    def get(self, key, default=None):
+        entry = self.cache.get(id(key), _missing)
+        if entry is _missing or entry[0] is not key:
+            return default
+        return entry[1]
+
+    def __setitem__(self, key, value):
+        self.cache[id(key)] = (key, value)
+
+    @property
+    def hits(self):
+        return self.cache.hits
+
+    @property
+    def misses(self):
+        return self.cache.misses
+
+def _store(cache, key, value):
+    try:
+        cache[key] = value
+    except TypeError:
+        pass
+
+def _record(cache, stats):
+    if stats is not None:
+        stats['hits'] = stats.get('hits', 0) + cache.hits
+        stats['misses'] = stats.get('misses', 0) + cache.misses
+
+@curry
+def top_down_memo(rule, x, maxsize=1024, stats=None):
+    """ Apply a rule down a tree running it on the top nodes first
+
+    Like ``top_down`` but a subterm that occurs several times, as the same
+    object, is rewritten only once per call; repeated occurrences reuse the
+    cached result.  The cache holds at most ``maxsize`` entries.  If a
+    ``stats`` dict is given then the number of cache ``hits`` and ``misses``
+    is added to it.
+
+    Subterms are cached by identity, so a lookup costs the same whatever the
+    size of the subterm and a DAG is traversed in time linear in its
+    distinct nodes.  Hash-consed ``Term``s are identical whenever they are
+    equal, so for them every repeated subterm is rewritten once.
+
+    >>> from strategies.traverse import top_down_memo
+    >>> inc = lambda x: x + 1 if isinstance(x, int) else x
+    >>> stats = {}
+    >>> top_down_memo(inc, ('f', ('g', 1), ('g', 1)), stats=stats)
+    ('f', ('g', 2), ('g', 2))
+    >>> stats['hits'], stats['misses']
+    (1, 3)
+    """
+    cache = _IdentityCache(maxsize)
+    result = _walk(x, pre=rule, cache=cache)
+    _record(cache, stats)
+    return result
+
+@curry
+def bottom_up_memo(rule, x, maxsize=1024, stats=None):
+    """ Apply a rule up a tree, rewriting each distinct subterm once
+
+    See Also:
+        top_down_memo
+    """
+    cache = _IdentityCache(maxsize)
+    result = _walk(x, post=rule, cache=cache)
+    _record(cache, stats)
+    return result
+
+@curry
+def top_down_once_memo(rule, x, maxsize=1024, stats=None):
+    """ Apply a rule down a tree - stop on success - with memoization
+
+    See Also:
+        top_down_memo
+    """
+    cache = _IdentityCache(maxsize)
+    result = do_one([rule, sall(partial(_walk, pre=rule, cache=cache))], x)
+    _record(cache, stats)
+    return result
+
+@curry
+def bottom_up_once_memo(rule, x, maxsize=1024, stats=None):
+    """ Apply a rule up a tree - stop on success - with memoization
+
+    See Also:
+        top_down_memo
+    """
+    cache = _IdentityCache(maxsize)
+    result = do_one([sall(partial(_walk, post=rule, cache=cache)), rule], x)
+    _record(cache, stats)
+    return result
+
+class RewriteCache(object):
+    """ Traversal results kept across calls
+
+    Each subterm's result is cached under the subterm itself, per rule, in a
+    single LRU cache of at most ``maxsize`` entries.  Traversing a tree that
+    shares subterms with trees traversed before - e.g. an edited copy - only
+    visits the nodes on paths to the edits; unchanged subtrees are answered
+    from the cache.
+
+    Only hash-consed ``Term``s and leaves are cached, as equality alone does
+    not tell other nodes apart: ``('f', 1)`` equals ``('f', 1.0)``.  Terms
+    are identical exactly when they are equal and leaves are keyed with
+    their type, so large trees should be hash-consed.
+
+    Results depend on the rule, so call ``invalidate(rule)`` when a rule's
+    behavior changes, e.g. when a rule set is edited.
+
+    >>> from strategies.traverse import RewriteCache
+    >>> from strategies.term import split, hashcons, unhashcons
+    >>> seen = []
+    >>> def rl(x):
+    ...     seen.append(x)
+    ...     op, args = split(x)
+    ...     if op == 'add' and args[0] == 0:
+    ...         return args[1]
+    ...     return x
+    >>> session = RewriteCache()
+    >>> expr = hashcons(('mul', ('add', 0, ('add', 0, 'x')), 'y'))
+    >>> unhashcons(session.normalize(rl, expr))
+    ('mul', 'x', 'y')
+    >>> del seen[:]
+    >>> expr = hashcons(('pow', ('add', 0, ('add', 0, 'x')), 'y'))
+    >>> unhashcons(session.normalize(rl, expr))
+    ('pow', 'x', 'y')
+    >>> len(seen)  # only the new node is rewritten
+    1
+    """
+    def __init__(self, maxsize=100000):
+        self.cache = LRUCache(maxsize)
+        self.versions = dict()  # id(rule) -> (reference to rule, version)
+        self.counter = 0
+
+    def _view(self, kind, rule):
+        try:
+            version = self.versions[id(rule)][1]
+        except KeyError:
+            version = self._bump(rule)
+        return _Prefixed(self.cache, (kind, id(rule), version))
+
+    def _bump(self, rule):
+        self.counter += 1
+        key = id(rule)
+        entry = self.versions.get(key)
+        ref = entry[0] if entry is not None else _rule_ref(self.versions, rule)
+        self.versions[key] = (ref, self.counter)
+        return self.counter
+
+    def top_down(self, rule, x):
+        """ ``top_down(rule, x)`` using the cache """
+        return _walk(x, pre=rule, cache=self._view('top_down', rule))
+
+    def bottom_up(self, rule, x):
+        """ ``bottom_up(rule, x)`` using the cache """
+        return _walk(x, post=rule, cache=self._view('bottom_up', rule))
+
+    def normalize(self, rule, x):
+        """ Rewrite x to normal form, innermost first, using the cache
+
+        Equivalent to ``exhaust(bottom_up(rule))`` for a confluent rule.
+        """
+        return _normalize(rule, x, self._view('normalize', rule))
+
+    def invalidate(self, rule=None):
+        """ Forget results of rule, or of all rules
+
+        Entries are not removed at once; they can no longer be found and are
+        evicted as the cache fills.
+        """
+        if rule is None:
+            self.versions.clear()
+            self.cache.clear()
+        else:
+            self._bump(rule)
+
+    def info(self):
+        """ Hits, misses, evictions and size of the cache """
+        return self.cache.info()
+
+
+def _rule_ref(versions, rule):
+    """ A weak reference to rule that drops its entry from versions
+
+    Once a rule is collected its id may be reused, so its version must go;
+    its cached results can no longer be found and are evicted in time.
+    Rules that cannot be weakly referenced are held, which keeps their ids.
+    """
+    key = id(rule)
+
+    def remove(ref):
+        entry = versions.get(key)
+        if entry is not None and entry[0] is ref:
+            del versions[key]
+    try:
+        return weakref.ref(rule, remove)
+    except TypeError:
+        return rule
+
+
+class _Prefixed(object):
+    """ The part of a cache under keys ``(prefix, key)``
+
+    Keys are ``Term``s or leaves, the latter tagged with their type; other
+    keys raise TypeError, as unhashable ones do, and are not cached.
+    """
+    __slots__ = ('cache', 'prefix')
+
+    def __init__(self, cache, prefix):
+        self.cache, self.prefix = cache, prefix
+
+    def get(self, key, default=None):
+        return self.cache.get((self.prefix, _typed(key)), default)
+
+    def __setitem__(self, key, value):
+        self.cache[(self.prefix, _typed(key))] = value
+
+
+def _typed(key):
+    if type(key) is Term:
+        return key
+    if _split(key)[1] is None:
+        return (type(key), key)
+    raise TypeError("only Terms and leaves are cached")
+
+
+def _changed(new, old):
+    return new is not old and new != old
+
+def _innermost(rule, x):
+    refresh()
+    normal = dict()  # id(node) -> node, for nodes known to be in normal form
+    stack = []
+    node = x
+    while True:
+        if id(node) in normal:
+            result = node
+        else:
+            op, children = _split(node)
+            if children:
+                stack.append((node, op, children, []))
+                node = children[0]
+                continue
+            new = rule(node)
+            if _changed(new, node):
+                node = new
+                continue
+            normal[id(node)] = result = node
+
+        while stack:
+            parent, op, children, done = stack[-1]
+            done.append(result)
+            if len(done) < len(children):
+                node = children[len(done)]
+                break
+            stack.pop()
+            result = _rebuild(parent, op, children, done)
+            new = rule(result)
+            if _changed(new, result):
+                node = new
+                break
+            normal[id(result)] = result
+        else:
+            return result
+
+def _normalize(rule, x, cache):
+    """ Innermost normalization with normal forms kept in cache
+
+    As ``_innermost`` a rewritten node is re-entered on the explicit stack.
+    ``keys`` holds the nodes whose normal form is that of the current node:
+    the original subterm and each of its rewrites.
+    """
+    refresh()
+    stack = []
+    node, keys = x, [x]
+    while True:
+        try:
+            result = cache.get(node, _missing)
+        except TypeError:
+            result = _missing
+        if result is _missing:
+            op, children = _split(node)
+            if children:
+                stack.append((keys, node, op, children, []))
+                node = children[0]
+                keys = [node]
+                continue
+            new = rule(node)
+            if _changed(new, node):
+                node = new
+                keys.append(new)
+                continue
+            result = node
+        for key in keys:
+            _store(cache, key, result)
+
+        while stack:
+            keys, parent, op, children, done = stack[-1]
+            done.append(result)
+            if len(done) < len(children):
+                node = children[len(done)]
+                keys = [node]
+                break
+            stack.pop()
+            result = _rebuild(parent, op, children, done)
+            keys.append(result)
+            new = rule(result)
+            if _changed(new, result):
+                node = new
+                keys.append(new)
+                break
+            for key in keys:
+                _store(cache, key, result)
+        else:
+            return result
+
+def _outermost(rule, x):
+    """ Rewrite x to normal form, outermost redexes first, on an explicit stack
+
+    A node is rewritten until it is no redex, then its children are visited
+    in order.  Once all children are in normal form the node is rebuilt and,
+    if a child changed, examined again, so the stack is kept across rewrites
+    and only the rewritten node and its ancestors are revisited.
+    """
+    refresh()
+    normal = dict()  # id(node) -> node, for nodes known to be in normal form
+    stack = []
+    node = x
+    while True:
+        if id(node) in normal:
+            result = node
+        else:
+            new = rule(node)
+            if _changed(new, node):
+                node = new
+                continue
+            op, children = _split(node)
+            if children:
+                stack.append((node, op, children, []))
+                node = children[0]
+                continue
+            normal[id(node)] = result = node
+
+        while stack:
+            parent, op, children, done = stack[-1]
+            done.append(result)
+            if len(done) < len(children):
+                node = children[len(done)]
+                break
+            stack.pop()
+            result = _rebuild(parent, op, children, done)
+            if result is not parent:
+                new = rule(result)
+                if _changed(new, result):
+                    node = new
+                    break
+            normal[id(result)] = result
+        else:
+            return result
@@ -1,9 +1,10 @@
 from functools import partial
+from toolz import identity
 from strategies import chain, minimize
+from .core import _cached_objective
 from . import branch
 from .branch import yieldify
-
-identity = lambda x: x
+from .branch.search import _best_first, _beam, _none
 
 def treeapply(tree, join, leaf=identity):
     """ Apply functions onto recursive containers (tree)
@@ -36,7 +37,7 @@ def treeapply(tree, join, leaf=identity):
                                for child in tree])
     return leaf(tree)
 
-def greedy(tree, objective=identity, **kwargs):
+def greedy(tree, objective=identity, lookahead=0, cache=None, **kwargs):
     """ Execute a strategic tree.  Select alternatives greedily
 
     Trees
@@ -101,8 +102,40 @@ def greedy(tree, objective=identity, **kwargs):
         ([a, b], c)  # do either a or b, then do c
 
     the choice between running ``a`` or ``b`` is made without foresight to c
+
+    Lookahead
+    ---------
+
+    With ``lookahead=k`` each choice is made by trying every combination of
+    alternatives for it and the next ``k - 1`` choices and keeping the
+    alternative that leads to the lowest objective, measured just before the
+    choice after those (or at the end).  The other alternatives are then
+    dropped and the next choice is made the same way.  Larger ``k`` gives
+    better results at a cost exponential in ``k``; a ``k`` as large as the
+    number of choices finds the result of ``brute``.
+
+    >>> near10 = lambda x: abs(x - 10)
+    >>> greedy(([inc, double], double), objective=near10)(4)  # 8 beats 5
+    16
+    >>> greedy(([inc, double], double), objective=near10, lookahead=1)(4)
+    10
+
+    Caching
+    -------
+
+    ``cache=n`` keeps the objective of the last ``n`` distinct results, so
+    that an expensive objective is computed once per result across all
+    choices and calls; results must be hashable.
+
+    See Also:
+        strategies.core.memoized
     """
-    optimize = partial(minimize, objective=objective)
+    if lookahead:
+        # apply leaf, if given, as treeapply would
+        tree = treeapply(tree, {list: list, tuple: tuple}, **kwargs)
+        return partial(_lookahead, tree, objective, cache, lookahead)
+    # every choice finds the same memoized objective, see minimize
+    optimize = partial(minimize, objective=objective, cache=cache)
     return treeapply(tree, {list: optimize, tuple: chain}, **kwargs)
 
 def allresults(tree, leaf=yieldify):
@@ -129,5 +162,280 @@ def allresults(tree, leaf=yieldify):
                      leaf=leaf)
 
 def brute(tree, objective=identity, **kwargs):
-    return lambda expr: min(tuple(allresults(tree, **kwargs)(expr)),
-                            key=objective)
+    return partial(_brute, allresults(tree, **kwargs), objective)
+
+def _brute(results, objective, expr):
+    return min(tuple(results(expr)), key=objective)
+
+def best_first(tree, objective=identity, lower_bound=None):
+    """ Execute a strategic tree.  Expand the most promising results first
+
+    Partial results - the expression after the operations up to some choice
+    in the tree have run - are kept in a priority queue ordered by the
+    objective and the most promising one is advanced to its next choice.
+
+    Without ``lower_bound`` the first complete result reached is returned.
+    With an admissible ``lower_bound`` - a function of a partial result that
+    never exceeds the objective of any complete result reachable from it -
+    partial results that cannot beat the best complete result are pruned and
+    the returned result is the one ``brute`` would find, usually without
+    enumerating every possibility.
+
+    >>> from strategies.tree import best_first
+    >>> inc = lambda x: x + 1
+    >>> dec = lambda x: x - 1
+    >>> tree = ([inc, dec], [inc, dec], [inc, dec])
+    >>> best_first(tree, lower_bound=lambda x: x - 3)(0)  # values only drop 3
+    -3
+
+    See strategies.tree.greedy for details on input
+    """
+    return partial(_search, _best_first, tree,
+                   (_value(objective), lower_bound and _value(lower_bound)))
+
+def beam(tree, width=10, objective=identity, lower_bound=None):
+    """ Execute a strategic tree.  Keep only the best few partial results
+
+    Partial results are advanced one choice at a time and only the ``width``
+    best by objective survive each step.  An optional ``lower_bound`` prunes
+    partial results that cannot beat the best complete result.  ``width=1``
+    is a greedy search; a large width approaches ``brute``.
+
+    >>> from strategies.tree import beam
+    >>> inc = lambda x: x + 1
+    >>> dec = lambda x: x - 1
+    >>> beam(([inc, dec], [inc, dec]), width=2)(0)
+    -2
+
+    See strategies.tree.greedy for details on input
+    """
+    return partial(_search, _beam, tree,
+                   (_value(objective), width,
+                    lower_bound and _value(lower_bound)))
+
+def _value(fn):
+    """ Lift a function of expressions to one of search states """
+    return partial(_of_expr, fn)
+
+def _of_expr(fn, state):
+    return fn(state[0])
+
+def _search(search, tree, args, expr):
+    best = search(_advance(expr, (tree, ())), _expand_tree, *args)
+    if best is _none:
+        raise ValueError("Strategic tree has no results")
+    return best[0]
+
+def _advance(expr, plan):
+    """ Run the operations of a plan up to its next choice
+
+    A plan is a linked list ``(node, rest)`` of tree nodes still to run.
+    Returns a search state: the new expression and the remaining plan.
+    """
+    while plan:
+        node, rest = plan
+        if isinstance(node, list):
+            break
+        if isinstance(node, tuple):
+            for child in reversed(node):
+                rest = (child, rest)
+        else:
+            expr = node(expr)
+        plan = rest
+    return expr, plan
+
+def _lookahead(tree, objective, cache, k, expr):
+    objective = _cached_objective(objective, cache)
+    state = _advance(expr, (tree, ()))
+    while state[1]:
+        successors, _ = _expand_tree(state)
+        state = min(successors,
+                    key=lambda s: _horizon(s, _expand_tree, objective, k - 1))
+    return state[0]
+
+def _horizon(state, expand, objective, k):
+    """ The least objective reachable from a state within k more choices """
+    if k <= 0 or not state[1]:
+        return objective(state[0])
+    return min(_horizon(s, expand, objective, k - 1) for s in expand(state)[0])
+
+def _expand_tree(state):
+    """ Successors of a search state, one per alternative of its next choice
+
+    States whose plan is exhausted are complete results.
+    """
+    expr, plan = state
+    if not plan:
+        return [], True
+    choice, rest = plan
+    return [_advance(expr, (alt, rest)) for alt in choice], False
+
+def compile_tree(tree, semantics='greedy', objective=identity):
+    """ Compile a strategic tree into a single flat function
+
+    The tree is translated once into straight-line Python source: chains
+    become sequential assignments (or nested loops), choices become inline
+    comparisons (or a deduplicating generator).  The resulting function
+    avoids the per-call dispatch and partial application of ``treeapply``.
+
+    semantics - one of
+        'greedy'     - like ``greedy(tree, objective)``
+        'allresults' - like ``allresults(tree)``; returns a generator
+        'brute'      - like ``brute(tree, objective)``
+
+    >>> from strategies.tree import compile_tree
+    >>> inc    = lambda x: x + 1
+    >>> dec    = lambda x: x - 1
+    >>> double = lambda x: 2*x
+    >>> tree = [inc, (dec, double)]
+    >>> fn = compile_tree(tree)
+    >>> fn(4), fn(1)
+    (5, 0)
+    >>> sorted(compile_tree(tree, 'allresults')(4))
+    [5, 6]
+    >>> compile_tree(tree, 'brute', objective=lambda x: -x)(4)
+    6
+
+    See strategies.tree.greedy for details on input
+    """
+    if semantics not in ('greedy', 'allresults', 'brute'):
+        raise ValueError("Unknown semantics: %s" % semantics)
+    return _TreeCompiler(objective).compile(tree, semantics)
+
+
+class _TreeCompiler(object):
+    """ Emit Python source for a strategic tree """
+    def __init__(self, objective):
+        self.consts = {'objective': objective}
+        self.names = {}
+        self.defs = []
+        self.counter = 0
+
+    def fresh(self, prefix='v'):
+        self.counter += 1
+        return '%s%d' % (prefix, self.counter)
+
+    def const(self, fn):
+        if id(fn) not in self.names:
+            name = self.fresh('f')
+            self.names[id(fn)] = name
+            self.consts[name] = fn
+        return self.names[id(fn)]
+
+    def compile(self, tree, semantics):
+        if semantics == 'greedy':
+            lines = []
+            out = self.greedy(tree, 'x', lines)
+            self.defs.append(['def plan(x):'] + _indent(lines) +
+                             ['    return %s' % out])
+        else:
+            body = lambda v: ['yield %s' % v]
+            self.defs.append(['def plan(x):'] +
+                             _indent(self.allresults(tree, 'x', body) +
+                                     ['if False:', '    yield x']))
+            if semantics == 'brute':
+                self.defs.append(['def brute(x):',
+                                  '    return min(plan(x), key=objective)'])
+        entry = 'brute' if semantics == 'brute' else 'plan'
+        args = sorted(self.consts)
+        source = '\n'.join(['def make(%s):' % ', '.join(args)] +
+                           _indent(sum(self.defs, []) +
+                                   ['return %s' % entry]))
+        namespace = {}
+        exec(compile(source, '<strategy tree>', 'exec'), namespace)
+        fn = namespace['make'](*[self.consts[a] for a in args])
+        fn.source = source
+        return fn
+
+    def greedy(self, tree, x, lines):
+        """ Emit lines computing the greedy result of tree on x """
+        if isinstance(tree, tuple):
+            for child in tree:
+                x = self.greedy(child, x, lines)
+            return x
+        out = self.fresh()
+        if isinstance(tree, list):
+            if not tree:
+                lines.append('%s = min((), key=objective)' % out)
+            elif len(tree) == 1:
+                return self.greedy(tree[0], x, lines)
+            else:
+                best = self.fresh('k')
+                for i, child in enumerate(tree):
+                    v = self.greedy(child, x, lines)
+                    if i == 0:
+                        lines.append('%s = %s' % (out, v))
+                        lines.append('%s = objective(%s)' % (best, v))
+                    else:
+                        k = self.fresh('k')
+                        lines.append('%s = objective(%s)' % (k, v))
+                        lines.append('if %s < %s:' % (k, best))
+                        lines.append('    %s, %s = %s, %s' % (out, best, v, k))
+            return out
+        lines.append('%s = %s(%s)' % (out, self.const(tree), x))
+        return out
+
+    def allresults(self, tree, x, body, depth=0):
+        """ Emit lines running body(v) on every result v of tree on x """
+        return self.stages(_stages(tree), x, body, depth)
+
+    def stages(self, stages, x, body, depth):
+        if not stages:
+            return body(x)
+        out = self.fresh()
+        if depth >= _MAX_NESTING:
+            # Python limits statically nested blocks; continue in a new def
+            fn = self.sequence(stages)
+            return ['for %s in %s(%s):' % (out, fn, x)] + _indent(body(out))
+        head, rest = stages[0], stages[1:]
+        if isinstance(head, list):
+            fn = self.choice(head)
+            return (['for %s in %s(%s):' % (out, fn, x)] +
+                    _indent(self.stages(rest, out, body, depth + 1)))
+        return (['%s = %s(%s)' % (out, self.const(head), x)] +
+                self.stages(rest, out, body, depth))
+
+    def sequence(self, stages):
+        """ Emit a generator function yielding the results of a chain """
+        name = self.fresh('sequence')
+        lines = self.stages(stages, 'x', lambda v: ['yield %s' % v], 0)
+        lines.extend(['if False:', '    yield x'])
+        self.defs.append(['def %s(x):' % name] + _indent(lines))
+        return name
+
+    def choice(self, tree):
+        """ Emit a generator function yielding the unique results of a list """
+        name, seen = self.fresh('choice'), self.fresh('seen')
+        unique = lambda v: ['if %s not in %s:' % (v, seen),
+                            '    %s.add(%s)' % (seen, v),
+                            '    yield %s' % v]
+        lines = ['%s = set()' % seen]
+        for alt in _alternatives(tree):
+            lines.extend(self.allresults(alt, 'x', unique))
+        lines.extend(['if False:', '    yield x'])
+        self.defs.append(['def %s(x):' % name] + _indent(lines))
+        return name
+
+
+_MAX_NESTING = 12
+
+
+def _stages(tree):
+    """ Flatten nested chains into a list of functions and choices """
+    if isinstance(tree, tuple):
+        return sum([_stages(child) for child in tree], [])
+    return [tree]
+
+
+def _alternatives(tree):
+    """ Flatten nested choices """
+    for alt in tree:
+        if isinstance(alt, list):
+            for a in _alternatives(alt):
+                yield a
+        else:
+            yield alt
+
+
+def _indent(lines):
+    return ['    ' + line for line in lines]